@@ -0,0 +1,477 @@
+"""Local end-to-end harness for the palsar Azure Function
+
+Runs the function's ``main`` against in-process stand-ins for blob storage
+and the processed queue (both backed by local directories), fed with
+synthetic tile archives, and reports throughput, per-stage latency and peak
+scratch disk and memory use at a given concurrency.
+
+Requires the packages in requirements.txt (the Azure SDK is imported by
+the function, but never talks to Azure here). Items are validated by the
+function, which fetches the STAC schemas once per worker process; pass
+--no-validate to run offline. The function only logs its errors, they are
+collected per invocation and a tile without a processed message counts as
+failed.
+
+Usage:
+    python src/azure/harness.py --tiles 8 --concurrency 4 --size 4500
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import rasterio  # type: ignore
+from rasterio.transform import from_origin  # type: ignore
+
+STAGES = ["download", "cogify", "create_item", "upload"]
+INPUT_CONTAINER = "dltest"
+
+_XML_SIDECAR = """<?xml version="1.0" encoding="utf-8"?>
+<Metadata>
+  <GeneralMetadata>
+    <DataCollectionTime TimeZone="UTC">
+      <NumberOfAcquisitions>1</NumberOfAcquisitions>
+      <FirstAcquistionDate>{year}-06-01</FirstAcquistionDate>
+      <LastAcquistitionDate>{year}-06-01</LastAcquistitionDate>
+    </DataCollectionTime>
+    <DataAccess>
+      <ProcessingFacility>harness</ProcessingFacility>
+      <SoftwareVersion>synthetic 0</SoftwareVersion>
+    </DataAccess>
+  </GeneralMetadata>
+</Metadata>
+"""
+
+
+class LocalBlobClient:
+    """Blob client stand-in reading and writing one local file"""
+
+    def __init__(self, path: Path, url: str):
+        self.path = path
+        self.url = url
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def download_blob(self) -> "LocalBlobClient":
+        return self
+
+    def readinto(self, stream) -> int:
+        with open(self.path, "rb") as f:
+            shutil.copyfileobj(f, stream, 1024 * 1024)
+        return self.path.stat().st_size
+
+    def upload_blob(self, data, overwrite: bool = False) -> None:
+        if self.path.exists() and not overwrite:
+            raise FileExistsError(f"{self.path} already exists")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}")
+        with open(partial, "wb") as f:
+            shutil.copyfileobj(data, f, 1024 * 1024)
+        os.replace(partial, self.path)
+
+
+class LocalBlobServiceClient:
+    """BlobServiceClient stand-in, one directory per container under root"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.url = self.root.as_uri()
+
+    def get_blob_client(self, container: str, blob: str) -> LocalBlobClient:
+        return LocalBlobClient(self.root / container / blob,
+                               f"{self.url}/{container}/{blob}")
+
+
+class LocalQueueClient:
+    """QueueClient stand-in, each message is a file in a directory"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def send_message(self, content: bytes) -> None:
+        name = f"{time.time():.6f}-{uuid.uuid4().hex}.msg"
+        (self.directory / name).write_bytes(content)
+
+    def messages(self) -> List[Dict]:
+        return [
+            json.loads(path.read_bytes())
+            for path in sorted(self.directory.glob("*.msg"))
+        ]
+
+
+class _Message:
+
+    def __init__(self, body: str):
+        self.body = body
+
+    def get_body(self) -> bytes:
+        return self.body.encode("utf-8")
+
+
+class _ErrorCollector(logging.Handler):
+    """Keeps the error records the function logs during one invocation"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.errors: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if record.exc_info and record.exc_info[1] is not None:
+            error = record.exc_info[1]
+            message = f"{message}: {type(error).__name__}: {error}"
+        self.errors.append(message)
+
+
+class _Context:
+
+    def __init__(self):
+        self.invocation_id = str(uuid.uuid4())
+
+
+def _tile_name(index: int) -> str:
+    return f"N{index // 180:02d}E{index % 180:03d}"
+
+
+def make_synthetic_archive(directory: str,
+                           tile: str,
+                           year: int = 2020,
+                           product: str = "MOS",
+                           size: int = 4500,
+                           seed: int = 0) -> str:
+    """Write a tar.gz shaped like a JAXA tile archive with random rasters
+
+    MOS tiles from 2019 on are GeoTIFFs with an XML sidecar, older tiles
+    and FNF are ENVI binaries with .hdr files, as in the real archives.
+
+    Returns:
+        str: Path of the archive
+    """
+    yy = year % 100
+    rng = np.random.default_rng(seed)
+    lat, lon = int(tile[1:3]), int(tile[4:7])
+    lat = lat if tile[0] == "N" else -lat
+    lon = lon if tile[3] == "E" else -lon
+    profile = dict(width=size,
+                   height=size,
+                   count=1,
+                   crs="EPSG:4326",
+                   transform=from_origin(lon, lat, 1 / size, 1 / size))
+
+    if product == "FNF":
+        bands = {"C": rng.integers(1, 4, (size, size), dtype=np.uint8)}
+    else:
+        # Speckled backscatter DNs plus the ancillary layers
+        bands = {
+            "sl_HH": (rng.gamma(4, 1500, (size, size)) + 1).astype(np.uint16),
+            "sl_HV": (rng.gamma(4, 600, (size, size)) + 1).astype(np.uint16),
+            "date": np.full((size, size), 2000 + yy, dtype=np.uint16),
+            "linci": rng.integers(20, 60, (size, size), dtype=np.uint8),
+            "mask": np.full((size, size), 255, dtype=np.uint8),
+        }
+
+    stem = f"{tile}_{yy:02d}_{product}_F02DAR"
+    source_directory = tempfile.mkdtemp(dir=directory)
+    try:
+        geotiff = product == "MOS" and yy >= 19
+        for band, data in bands.items():
+            name = f"{tile}_{yy:02d}_{band}_F02DAR"
+            if geotiff:
+                path = os.path.join(source_directory, f"{name}.tif")
+                driver = dict(driver="GTiff", compress="lzw")
+            else:
+                path = os.path.join(source_directory, name)
+                driver = dict(driver="ENVI")
+            with rasterio.open(path,
+                               "w",
+                               dtype=data.dtype,
+                               **profile,
+                               **driver) as dst:
+                dst.write(data, 1)
+        if geotiff:
+            Path(source_directory, f"{tile}_{yy:02d}_F02DAR.xml").write_text(
+                _XML_SIDECAR.format(year=year))
+
+        archive = os.path.join(directory, f"{stem}.tar.gz")
+        with tarfile.open(archive, "w:gz") as tar:
+            for name in sorted(os.listdir(source_directory)):
+                if not name.endswith(".aux.xml"):
+                    tar.add(os.path.join(source_directory, name), name)
+    finally:
+        shutil.rmtree(source_directory)
+    return archive
+
+
+_function = None
+
+
+def _init_worker(input_root: str,
+                 output_root: str,
+                 queue_directory: str,
+                 scratch_directory: str,
+                 validate: bool = True) -> None:
+    global _function
+    os.environ["PALSAR_SCRATCH_DIR"] = scratch_directory
+    os.environ["PALSAR_VALIDATE_ITEMS"] = "true" if validate else "false"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # The Azure Function package next to this file
+    import palsar as function  # type: ignore
+    function.configure_clients(LocalBlobServiceClient(input_root),
+                               LocalBlobServiceClient(output_root),
+                               LocalQueueClient(queue_directory))
+    _function = function
+
+
+def _invoke(blob: str) -> Dict:
+    collector = _ErrorCollector()
+    root = logging.getLogger()
+    root.addHandler(collector)
+    start = time.time()
+    try:
+        _function.main(_Message(blob), _Context())  # type: ignore
+    except BaseException as e:
+        # main catches Exception, this is e.g. a SystemExit
+        collector.errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        root.removeHandler(collector)
+    return {
+        "blob": blob,
+        "errors": collector.errors,
+        "seconds": time.time() - start,
+        # Peak resident memory of this worker process so far (KiB on Linux)
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def _directory_size(directory: str) -> int:
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _children_rss() -> Optional[int]:
+    """Total resident memory of this process' children, None without /proc"""
+    if not os.path.isdir("/proc"):
+        return None
+    parent = str(os.getpid())
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # ppid follows the parenthesized command name
+                ppid = f.read().rsplit(")", 1)[1].split()[1]
+            if ppid != parent:
+                continue
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError):
+            continue
+    return total
+
+
+class _Monitor(threading.Thread):
+    """Samples scratch disk and worker memory use until stopped"""
+
+    def __init__(self, scratch_directory: str, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.scratch_directory = scratch_directory
+        self.interval = interval
+        self.peak_disk = 0
+        self.peak_rss: Optional[int] = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def sample(self) -> None:
+        self.peak_disk = max(self.peak_disk,
+                             _directory_size(self.scratch_directory))
+        rss = _children_rss()
+        self.peak_rss = None if rss is None else max(self.peak_rss or 0, rss)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "mean": statistics.mean(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(len(values) - 1, int(0.95 * len(values)))],
+        "max": values[-1],
+    }
+
+
+def run_harness(workdir: str,
+                tiles: int = 4,
+                concurrency: int = 1,
+                size: int = 4500,
+                year: int = 2020,
+                product: str = "MOS",
+                validate: bool = True) -> Dict:
+    """Process synthetic tiles through the Azure Function and measure it
+
+    Args:
+        workdir (str): Directory holding the fake storage, queue and scratch
+        tiles (int): Number of tile archives to process
+        concurrency (int): Number of function invocations running at once
+        size (int): Width and height of the synthetic rasters
+        year (int): Year of the synthetic tiles
+        product (str): MOS or FNF
+        validate (bool): Validate the items against the STAC schemas,
+            which needs network access
+
+    Returns:
+        dict: Throughput, per-stage latency, peak resource use and the
+            errors of the tiles that failed
+    """
+    input_root = os.path.join(workdir, "input")
+    output_root = os.path.join(workdir, "output")
+    queue_directory = os.path.join(workdir, "processed-queue")
+    scratch_directory = os.path.join(workdir, "scratch")
+    container = os.path.join(input_root, INPUT_CONTAINER)
+    for directory in [container, output_root, scratch_directory]:
+        os.makedirs(directory, exist_ok=True)
+
+    blobs = []
+    for index in range(tiles):
+        archive = make_synthetic_archive(container,
+                                         _tile_name(index),
+                                         year,
+                                         product,
+                                         size,
+                                         seed=index)
+        blobs.append(os.path.basename(archive))
+    logging.info(f"Created {tiles} synthetic {product} archives")
+
+    monitor = _Monitor(scratch_directory)
+    monitor.start()
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(concurrency,
+                                 initializer=_init_worker,
+                                 initargs=(input_root, output_root,
+                                           queue_directory, scratch_directory,
+                                           validate)) as executor:
+            invocations = list(executor.map(_invoke, blobs))
+    finally:
+        elapsed = time.time() - start
+        monitor.stop()
+
+    messages = LocalQueueClient(queue_directory).messages()
+    processed = {m["file"] for m in messages}
+    errors = {
+        i["blob"]: i["errors"] or ["no processed message"]
+        for i in invocations if i["errors"] or i["blob"] not in processed
+    }
+    stages = {
+        stage: _summary([m["timings"][stage] for m in messages])
+        for stage in STAGES if messages
+    }
+    return {
+        "tiles": tiles,
+        "processed": len(messages),
+        "failed": len(errors),
+        "errors": errors,
+        "concurrency": concurrency,
+        "size": size,
+        "product": product,
+        "year": year,
+        "seconds": elapsed,
+        "tiles_per_minute": 60 * len(messages) / elapsed,
+        "invocation_seconds": _summary([i["seconds"] for i in invocations]),
+        "stage_seconds": stages,
+        "peak_scratch_bytes": monitor.peak_disk,
+        "peak_workers_rss_bytes": monitor.peak_rss,
+        "peak_worker_rss_bytes": max(i["max_rss"] for i in invocations),
+    }
+
+
+def _print_report(report: Dict) -> None:
+    mb = 1024 * 1024
+    print(f"{report['processed']}/{report['tiles']} {report['product']} tiles"
+          f" ({report['size']}px) in {report['seconds']:.1f} s with"
+          f" concurrency {report['concurrency']}:"
+          f" {report['tiles_per_minute']:.2f} tiles/min")
+    for blob, errors in report["errors"].items():
+        print(f"failed {blob}:")
+        for error in errors:
+            print(f"  {error}")
+    print(f"{'stage':<12}{'mean':>8}{'p50':>8}{'p95':>8}{'max':>8}  (s)")
+    rows = dict(report["stage_seconds"], total=report["invocation_seconds"])
+    for stage, values in rows.items():
+        print(f"{stage:<12}" + "".join(f"{values[k]:>8.2f}"
+                                       for k in ["mean", "p50", "p95", "max"]))
+    print(f"peak scratch disk: {report['peak_scratch_bytes'] / mb:.0f} MB")
+    if report["peak_workers_rss_bytes"] is not None:
+        print(f"peak memory, all workers: "
+              f"{report['peak_workers_rss_bytes'] / mb:.0f} MB")
+    print(f"peak memory, one worker: "
+          f"{report['peak_worker_rss_bytes'] / mb:.0f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--tiles", type=int, default=4)
+    parser.add_argument("-c", "--concurrency", type=int, default=1)
+    parser.add_argument("-s", "--size", type=int, default=4500)
+    parser.add_argument("-y", "--year", type=int, default=2020)
+    parser.add_argument("-p",
+                        "--product",
+                        choices=["MOS", "FNF"],
+                        default="MOS")
+    parser.add_argument("-w",
+                        "--workdir",
+                        help="Keep storage and outputs in this directory")
+    parser.add_argument("--no-validate",
+                        dest="validate",
+                        action="store_false",
+                        help="Skip STAC schema validation (works offline)")
+    parser.add_argument("-o", "--report", help="Write the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="palsar-harness-")
+    try:
+        report = run_harness(workdir, args.tiles, args.concurrency, args.size,
+                             args.year, args.product, args.validate)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    _print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import json
 import logging
 import os
 import shutil
 import tempfile
 import time
+from typing import Any, Optional
 from urllib.parse import urlsplit, urlunsplit
 
 import azure.functions as func  # type: ignore
@@ -12,21 +14,42 @@ from azure.storage.queue import BinaryBase64EncodePolicy  # type: ignore
 from azure.storage.queue import QueueClient  # type: ignore
 
 from stactools.palsar import cog, stac
-
-input_blob_service_client = BlobServiceClient.from_connection_string(
-    os.environ["ConnectionStringInput"])
-output_blob_service_client = BlobServiceClient.from_connection_string(
-    os.environ["ConnectionStringOutput"])
-processed_queue_client = QueueClient.from_connection_string(
-    os.environ["ConnectionStringQueue"],
-    queue_name="processed-queue",
-    message_encode_policy=BinaryBase64EncodePolicy(),
-    message_decode_policy=BinaryBase64DecodePolicy())
+from stactools.palsar.errors import PalsarNameError
+from stactools.palsar.utils import palsar_name_parse
+
+# Storage clients, created from the connection strings on first use or
+# injected with configure_clients (e.g. by the local harness)
+input_blob_service_client: Optional[Any] = None
+output_blob_service_client: Optional[Any] = None
+processed_queue_client: Optional[Any] = None
+
+
+def configure_clients(input_client=None,
+                      output_client=None,
+                      queue_client=None):
+    global input_blob_service_client, output_blob_service_client
+    global processed_queue_client
+    input_blob_service_client = (input_client
+                                 or BlobServiceClient.from_connection_string(
+                                     os.environ["ConnectionStringInput"]))
+    output_blob_service_client = (output_client
+                                  or BlobServiceClient.from_connection_string(
+                                      os.environ["ConnectionStringOutput"]))
+    processed_queue_client = queue_client or QueueClient.from_connection_string(
+        os.environ["ConnectionStringQueue"],
+        queue_name="processed-queue",
+        message_encode_policy=BinaryBase64EncodePolicy(),
+        message_decode_policy=BinaryBase64DecodePolicy())
 
 
 def main(msg: func.QueueMessage, context: func.Context) -> None:
     invocation_id = context.invocation_id
     input_container = "dltest"
+    if input_blob_service_client is None:
+        configure_clients()
+    assert input_blob_service_client is not None
+    assert output_blob_service_client is not None
+    assert processed_queue_client is not None
 
     logging.getLogger("azure").setLevel(logging.WARNING)
 
@@ -41,7 +64,9 @@ def main(msg: func.QueueMessage, context: func.Context) -> None:
     logging.info(
         f"{invocation_id} - Python queue trigger function processed a queue item: %s",
         body)
-    tempdir = tempfile.mkdtemp(prefix="palsar-", dir='/home')
+    tempdir = tempfile.mkdtemp(prefix="palsar-",
+                               dir=os.environ.get("PALSAR_SCRATCH_DIR",
+                                                  "/home"))
     logging.info(f"{invocation_id} - Created tempdir {tempdir}")
 
     try:
@@ -57,11 +82,16 @@ def main(msg: func.QueueMessage, context: func.Context) -> None:
         blob_client = input_blob_service_client.get_blob_client(
             container=input_container, blob=source_archive_file)
         if blob_client.exists():
+            # Seconds spent in each stage, reported in the processed message
+            timings = {}
+            stage_start = time.time()
             _, file = os.path.split(source_archive_file)
             input_targz_filepath = os.path.join(tempdir, file)
             download_input_tgz(input_targz_filepath, blob_client,
                                invocation_id)
+            timings["download"] = time.time() - stage_start
 
+            stage_start = time.time()
             cogs = cog.cogify(input_targz_filepath, tempdir)
             logging.info(
                 f"COGified {input_targz_filepath} and saved COGs at {str(cogs)}"
@@ -72,10 +102,11 @@ def main(msg: func.QueueMessage, context: func.Context) -> None:
                 f"{invocation_id} - Cleaned up source TarGZ at {input_targz_filepath}"
             )
 
-            upload_cogs(upload_rootdir, output_container_name, cogs,
-                        invocation_id)
-            logging.info(f"{invocation_id} - Uploaded COGs")
+            timings["cogify"] = time.time() - stage_start
 
+            # Generate STAC while the COGs are still on disk, they are
+            # removed one by one as soon as they are uploaded
+            stage_start = time.time()
             base_url = os.path.join(
                 remove_query_params_and_fragment(
                     output_blob_service_client.url), output_container_name,
@@ -85,25 +116,37 @@ def main(msg: func.QueueMessage, context: func.Context) -> None:
             logging.info(
                 f"{invocation_id} - Generated STAC JSON at {str(stac_file_path)}"
             )
+            timings["create_item"] = time.time() - stage_start
+
+            stage_start = time.time()
+            upload_cogs(upload_rootdir, output_container_name, cogs,
+                        invocation_id)
+            logging.info(f"{invocation_id} - Uploaded COGs")
 
             stac_url = upload_stac(upload_rootdir, output_container_name,
                                    stac_file_path, invocation_id)
             logging.info(
                 f"{invocation_id} - Uploaded STAC JSON at {str(stac_url)}")
 
+            timings["upload"] = time.time() - stage_start
+
             end_time = time.time()
             logging.info(
                 f"{invocation_id} - Runtime is {end_time - start_time}")
             processed_queue_client.send_message(
-                str.encode("{\"file\":\"" + source_archive_file +
-                           "\",\"invocation_id\":\"" + invocation_id + "\"}"))
+                str.encode(
+                    json.dumps({
+                        "file": source_archive_file,
+                        "invocation_id": invocation_id,
+                        "timings": timings,
+                    })))
             logging.info(f"{invocation_id} - All wrapped up. Exiting")
         else:
             logging.error(
                 f"{invocation_id} - File does not exist {source_archive_file} \n"
                 f"container {input_container}")
     except Exception as e:
-        logging.info(
+        logging.exception(
             f"{invocation_id} - Exception {e} for queue message with body '{body}' "
         )
     shutil.rmtree(tempdir)
@@ -111,12 +154,11 @@ def main(msg: func.QueueMessage, context: func.Context) -> None:
 
 
 def derive_output_directory(archive_name):
-    output_directory = None
-    if "FNF" in archive_name:
-        output_directory = "alos_fnf_mosaic"
-    if "MOS" in archive_name:
-        output_directory = "alos_palsar_mosaic"
-    return output_directory
+    try:
+        product = palsar_name_parse(archive_name).product
+    except PalsarNameError:
+        return None
+    return {"FNF": "alos_fnf_mosaic", "MOS": "alos_palsar_mosaic"}.get(product)
 
 
 def upload_stac(rootdir, output_container_name, json_file_path, invocation_id):
@@ -151,17 +193,21 @@ def upload_cogs(output_rootdir, output_container, cogs, invocation_id):
                 )
             except Exception as e:
                 logging.info(f"{invocation_id} - Exception {e} for {cogfile}")
+                continue
+        os.remove(cogfile)
 
 
 def generate_stac(tempdir, source_archive, cogs, base_url, invocation_id):
-    source_basename = os.path.basename(source_archive)
-    json_file = '_'.join(source_basename.split("_")[0:3])
+    json_file = palsar_name_parse(source_archive).stem
     json_path = os.path.join(tempdir, f'{json_file}.json')
     self_href = os.path.join(base_url, os.path.basename(json_path))
 
     item = stac.create_item(cogs, base_url)
     item.set_self_href(self_href)
-    item.validate()
+    # Validation fetches the STAC schemas, PALSAR_VALIDATE_ITEMS=false skips
+    # it (e.g. for an offline run of the local harness)
+    if os.environ.get("PALSAR_VALIDATE_ITEMS", "true").lower() != "false":
+        item.validate()
     item.save_object(dest_href=json_path)
 
     logging.info(f"{invocation_id} - Saved STAC JSON at {json_path}")
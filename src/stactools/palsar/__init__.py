@@ -1,10 +1,13 @@
-import stactools.core
-
-from stactools.palsar.stac import create_collection, create_item
-
+# Keep this module light: the stactools CLI imports every plugin at startup,
+# so the API (which pulls in rasterio, shapely and pystac) loads on first use.
 __all__ = ['create_collection', 'create_item']
 
-stactools.core.use_fsspec()
+
+def __getattr__(name):
+    if name in __all__:
+        from stactools.palsar import stac
+        return getattr(stac, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def register_plugin(registry):
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                wait)
+from typing import Dict, Iterable, List, Optional
+
+import fsspec  # type: ignore
+
+from stactools.palsar import cog, stac, validate
+from stactools.palsar.resources import configure_resources, resources_from_env
+from stactools.palsar.utils import archive_extracted_size, palsar_name_parse
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STAGES = ["download", "cogify", "create_item", "upload"]
+
+# Fallback ratio of extracted to archive size when it can't be read
+ARCHIVE_EXPANSION = 4
+# COGs with overviews can be larger than the (LZW compressed) sources
+COG_EXPANSION = 1.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tiles (
+    source TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    stage TEXT,
+    error TEXT,
+    started REAL,
+    finished REAL,
+    timings TEXT,
+    outputs TEXT
+)
+"""
+
+
+class WorkLedger:
+    """Durable SQLite record of the tiles of a backfill and their status"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add(self, sources: Iterable[str]) -> None:
+        """Register tiles, keeping the status of those already known"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tiles (source) VALUES (?)",
+                ((source, ) for source in sources))
+
+    def recover(self) -> int:
+        """Return tiles left running by a crashed run to the queue"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE tiles SET status = ? WHERE status = ?",
+                (PENDING, RUNNING))
+        return cursor.rowcount
+
+    def todo(self, retry_failed: bool = False) -> List[str]:
+        status = FAILED if retry_failed else PENDING
+        rows = self.conn.execute(
+            "SELECT source FROM tiles WHERE status = ? ORDER BY source",
+            (status, ))
+        return [row["source"] for row in rows]
+
+    def start(self, source: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE tiles SET status = ?, attempts = attempts + 1, "
+                "started = ?, finished = NULL, stage = NULL, error = NULL "
+                "WHERE source = ?", (RUNNING, time.time(), source))
+
+    def finish(self, source: str, result: Dict) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE tiles SET status = ?, finished = ?, timings = ?, "
+                "outputs = ? WHERE source = ?",
+                (DONE, time.time(), json.dumps(
+                    result["timings"]), json.dumps(result["outputs"]), source))
+
+    def fail(self, source: str, stage: Optional[str], error: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE tiles SET status = ?, finished = ?, stage = ?, "
+                "error = ? WHERE source = ?",
+                (FAILED, time.time(), stage, error, source))
+
+    def get(self, source: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM tiles WHERE source = ?",
+                                (source, )).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM tiles GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+
+class TileError(Exception):
+    """Raised by process_tile, records the stage that failed"""
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(stage, message)
+        self.stage = stage
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"{self.stage}: {self.message}"
+
+
+def sha256sum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def estimate_scratch_bytes(source: str) -> int:
+    """Projected peak scratch disk usage of processing one tile archive"""
+    try:
+        archive = fsspec.core.url_to_fs(source)[0].size(source)
+    except (OSError, ValueError):
+        return 0
+    extracted = archive_extracted_size(source) or archive * ARCHIVE_EXPANSION
+    if archive * ARCHIVE_EXPANSION >= 2**32:
+        # The gzip size may have wrapped around 4 GiB undetected, don't go
+        # below the fallback ratio for archives this large
+        extracted = max(extracted, archive * ARCHIVE_EXPANSION)
+    # Sources are deleted as their COG is written, so the archive, the
+    # extracted rasters and the COG overhead are never all on disk at once
+    return int(archive + extracted * COG_EXPANSION)
+
+
+def process_tile(source: str,
+                 destination: str,
+                 url: str = '',
+                 scratch_dir: Optional[str] = None) -> Dict:
+    """Run one tile archive through download, cogify, create_item and upload
+
+    Args:
+        source (str): HREF (local or fsspec URL) of the tile archive
+        destination (str): Directory (local or fsspec URL) for the outputs
+        url (str): Optional base HREF/URL inside the JSON links
+        scratch_dir (str): Parent directory for the per-tile scratch space
+
+    Returns:
+        dict: Per-stage timings and sha256 checksums of the outputs
+    """
+    timings: Dict[str, float] = {}
+    outputs: Dict[str, str] = {}
+    tempdir = tempfile.mkdtemp(prefix="palsar-", dir=scratch_dir)
+    stage = STAGES[0]
+    try:
+        start = time.time()
+        archive = os.path.join(tempdir, os.path.basename(source))
+        with fsspec.open(source, "rb") as src, open(archive, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        timings[stage] = time.time() - start
+
+        stage, start = STAGES[1], time.time()
+        cog_directory = os.path.join(tempdir, "cogs")
+        os.makedirs(cog_directory)
+        cogs = cog.cogify(archive, cog_directory)
+        os.remove(archive)
+        invalid = validate.validate_cogs(
+            [path for path in cogs.values() if path.endswith(".tif")])
+        if invalid:
+            raise ValueError(f"Invalid COG layout {invalid}")
+        timings[stage] = time.time() - start
+
+        stage, start = STAGES[2], time.time()
+        item = stac.create_item(cogs, url)
+        json_file = palsar_name_parse(source).stem
+        json_path = os.path.join(cog_directory, f'{json_file}.json')
+        item.set_self_href(os.path.join(url, os.path.basename(json_path)))
+        item.save_object(dest_href=json_path)
+        timings[stage] = time.time() - start
+
+        stage, start = STAGES[3], time.time()
+        fs, root = fsspec.core.url_to_fs(destination)
+        fs.makedirs(root, exist_ok=True)
+        for path in [*cogs.values(), json_path]:
+            name = os.path.basename(path)
+            outputs[name] = sha256sum(path)
+            fs.put_file(path, f"{root.rstrip('/')}/{name}")
+            os.remove(path)
+        timings[stage] = time.time() - start
+    except Exception as e:
+        raise TileError(stage, f"{type(e).__name__}: {e}") from e
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    return {"timings": timings, "outputs": outputs}
+
+
+def _record(ledger: WorkLedger, source: str, future: Future) -> None:
+    try:
+        ledger.finish(source, future.result())
+        logger.info(f"Finished {source}")
+    except TileError as e:
+        ledger.fail(source, e.stage, e.message)
+        logger.error(f"Failed {source} - {e}")
+    except Exception as e:
+        ledger.fail(source, None, f"{type(e).__name__}: {e}")
+        logger.error(f"Failed {source} - {e}")
+
+
+def run_backfill(ledger_path: str,
+                 destination: str,
+                 sources: Iterable[str] = (),
+                 url: str = '',
+                 workers: Optional[int] = None,
+                 retry_failed: bool = False,
+                 scratch_dir: Optional[str] = None,
+                 scratch_budget: Optional[int] = None) -> Dict[str, int]:
+    """Process tiles recorded in a work ledger with a pool of workers
+
+    New sources are added to the ledger, tiles interrupted by a crash are
+    queued again and completed tiles are never redone. A tile is only
+    started when its projected scratch usage fits in the budget left by
+    the tiles already running.
+
+    Args:
+        ledger_path (str): Path to the SQLite work ledger
+        destination (str): Directory (local or fsspec URL) for the outputs
+        sources (list): Tile archive HREFs to add to the ledger
+        url (str): Optional base HREF/URL inside the JSON links
+        workers (int): Number of worker processes, defaults to what the
+            CPU and memory limits allow
+        retry_failed (bool): Only process tiles that previously failed
+        scratch_dir (str): Parent directory for per-tile scratch space
+        scratch_budget (int): Scratch disk budget in bytes, defaults to the
+            free space in scratch_dir
+
+    Returns:
+        dict: Number of tiles in the ledger by status
+    """
+    # GDAL threads and cache are shared out over the workers
+    resources = resources_from_env(workers)
+    workers = resources.workers
+    logger.info(f"Using {resources}")
+    ledger = WorkLedger(ledger_path)
+    try:
+        ledger.add(sources)
+        recovered = ledger.recover()
+        if recovered:
+            logger.info(f"Requeued {recovered} tiles from an interrupted run")
+        todo = ledger.todo(retry_failed)
+        logger.info(f"Processing {len(todo)} tiles with {workers} workers")
+
+        if scratch_budget is None:
+            scratch_budget = shutil.disk_usage(scratch_dir
+                                               or tempfile.gettempdir()).free
+
+        queue = deque(todo)
+        running: Dict[Future, str] = {}
+        reserved: Dict[Future, int] = {}
+        # Estimated once per tile, the head of the queue may wait on the
+        # budget for many passes and remote estimates are network calls
+        estimates: Dict[str, int] = {}
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=configure_resources,
+                                 initargs=(resources, )) as executor:
+            while queue or running:
+                # Only mark tiles as running once a worker and enough
+                # scratch space are free for them
+                while queue and len(running) < workers:
+                    if queue[0] not in estimates:
+                        estimates[queue[0]] = estimate_scratch_bytes(queue[0])
+                    projected = estimates[queue[0]]
+                    if running and (sum(reserved.values()) + projected >
+                                    scratch_budget):
+                        break
+                    if projected > scratch_budget:
+                        logger.warning(
+                            f"{queue[0]} needs ~{projected} bytes of scratch,"
+                            f" more than the {scratch_budget} budget")
+                    source = queue.popleft()
+                    ledger.start(source)
+                    future = executor.submit(process_tile, source, destination,
+                                             url, scratch_dir)
+                    running[future] = source
+                    reserved[future] = projected
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    reserved.pop(future)
+                    _record(ledger, running.pop(future), future)
+
+        return ledger.counts()
+    finally:
+        ledger.close()
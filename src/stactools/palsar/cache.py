@@ -0,0 +1,274 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import fsspec  # type: ignore
+import rasterio  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Environment variables used to enable the cache without touching code
+ENV_CACHE_DIR = "PALSAR_BLOCK_CACHE_DIR"
+ENV_CACHE_SIZE = "PALSAR_BLOCK_CACHE_SIZE"
+ENV_BLOCK_SIZE = "PALSAR_BLOCK_CACHE_BLOCKSIZE"
+
+DEFAULT_CACHE_SIZE = 2 * 1024**3  # bytes
+DEFAULT_BLOCK_SIZE = 256 * 1024  # bytes
+# Eviction goes down to this part of max_size, so the directory is not
+# walked again on every put once the cache is full
+EVICT_TARGET = 0.9
+
+_cache: Optional["BlockCache"] = None
+_configured = False
+_lock = threading.Lock()
+
+
+class BlockCache:
+    """Persistent on-disk cache of byte ranges read from remote files
+
+    Blocks are keyed by URL, etag and byte range so a changed remote object
+    never serves stale data. Recency is tracked with the file mtime, which
+    lets several processes share one cache directory; the least recently
+    used blocks are evicted once the total size exceeds ``max_size``, down
+    to ``EVICT_TARGET`` of it. Each instance only sees its own puts, so the
+    directory is measured again whenever an instance has written the gap
+    between the two since it last looked; N processes overshoot the cap by
+    at most N times that gap.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 max_size: int = DEFAULT_CACHE_SIZE,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.block_size = block_size
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+        # Bytes put since the directory was last measured
+        self._unmeasured = 0
+
+    @staticmethod
+    def key(url: str, etag: str, start: int, end: int) -> str:
+        token = f"{url}\n{etag}\n{start}-{end}"
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                # Blocks being written, possibly by another process
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def get(self, url: str, etag: str, start: int,
+            end: int) -> Optional[bytes]:
+        path = self._path(self.key(url, etag, start, end))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, url: str, etag: str, start: int, end: int,
+            data: bytes) -> None:
+        path = self._path(self.key(url, etag, start, end))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see partial blocks
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        try:
+            # Another thread or process may have stored the same block
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(data) - replaced
+            self._unmeasured += len(data)
+            if self._unmeasured >= self.max_size - int(
+                    self.max_size * EVICT_TARGET):
+                # Pick up the blocks other processes added meanwhile
+                self._size = sum(size for _, _, size in self._entries())
+                self._unmeasured = 0
+            if self._size > self.max_size:
+                self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used blocks until under EVICT_TARGET
+        of max_size"""
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        target = int(self.max_size * EVICT_TARGET)
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        logger.debug(f"Block cache at {self.directory} holds {total} bytes")
+        self._size = total
+        self._unmeasured = 0
+
+    def size(self) -> int:
+        return self._size
+
+
+class CachedFile(io.RawIOBase):
+    """Read-only, seekable file object serving reads through a BlockCache"""
+
+    def __init__(self, href: str, cache: BlockCache):
+        super().__init__()
+        self.href = href
+        self.cache = cache
+        self.fs, self.path = fsspec.core.url_to_fs(href)
+        info = self.fs.info(self.path)
+        self.length = info["size"]
+        self.etag = _etag(info)
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        elif whence == io.SEEK_END:
+            self.pos = self.length + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        return self.pos
+
+    def _block(self, index: int) -> bytes:
+        start = index * self.cache.block_size
+        end = min(start + self.cache.block_size, self.length)
+        data = self.cache.get(self.href, self.etag, start, end)
+        if data is None:
+            data = self.fs.cat_file(self.path, start=start, end=end)
+            self.cache.put(self.href, self.etag, start, end, data)
+        return data
+
+    def readinto(self, buffer: Any) -> int:
+        view = memoryview(buffer).cast("B")
+        end = min(self.pos + len(view), self.length)
+        if end <= self.pos:
+            return 0
+        written = 0
+        block_size = self.cache.block_size
+        while self.pos < end:
+            index, offset = divmod(self.pos, block_size)
+            chunk = self._block(index)[offset:offset + end - self.pos]
+            view[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self.pos += len(chunk)
+        return written
+
+
+def _etag(info: Dict) -> str:
+    """Pick the best available version identifier from fsspec file info"""
+    for key in ("ETag", "etag", "Etag", "md5", "content_md5"):
+        if info.get(key):
+            return str(info[key]).strip('"')
+    modified = info.get("last_modified") or info.get("mtime") or info.get(
+        "LastModified") or ""
+    return f"{info.get('size')}-{modified}"
+
+
+def configure_block_cache(
+        directory: Optional[str],
+        max_size: int = DEFAULT_CACHE_SIZE,
+        block_size: int = DEFAULT_BLOCK_SIZE) -> Optional[BlockCache]:
+    """Enable (or, with directory=None, disable) the shared block cache
+
+    Overrides the PALSAR_BLOCK_CACHE_* environment variables.
+
+    Args:
+        directory (str): Local directory for cached blocks, or None
+        max_size (int): Cache size cap in bytes
+        block_size (int): Size of the cached byte ranges in bytes
+
+    Returns:
+        BlockCache: The active cache, None when disabled
+    """
+    global _cache, _configured
+    with _lock:
+        _cache = BlockCache(directory, max_size,
+                            block_size) if directory else None
+        _configured = True
+    return _cache
+
+
+def get_block_cache() -> Optional[BlockCache]:
+    """Return the active block cache, configuring it from the environment"""
+    global _cache, _configured
+    with _lock:
+        if not _configured:
+            directory = os.environ.get(ENV_CACHE_DIR)
+            if directory:
+                _cache = BlockCache(
+                    directory,
+                    int(os.environ.get(ENV_CACHE_SIZE, DEFAULT_CACHE_SIZE)),
+                    int(os.environ.get(ENV_BLOCK_SIZE, DEFAULT_BLOCK_SIZE)))
+            _configured = True
+    return _cache
+
+
+def is_remote(href: str) -> bool:
+    protocol, _ = fsspec.core.split_protocol(href)
+    return protocol not in (None, "file", "local")
+
+
+def open_cached(href: str, mode: str = "rb") -> io.BufferedReader:
+    """Open a (remote) file for reading through the block cache
+
+    Falls back to a plain fsspec open when no cache is configured.
+    """
+    if mode not in ("r", "rb"):
+        raise ValueError(f"Block cache only supports reading, not {mode}")
+    cache = get_block_cache()
+    if cache is None:
+        return fsspec.open(href, "rb").open()
+    return io.BufferedReader(CachedFile(href, cache),
+                             buffer_size=cache.block_size)
+
+
+def read_range(href: str, start: int, end: int) -> bytes:
+    """Read bytes [start, end) of a file, through the cache when enabled"""
+    if get_block_cache() is None:
+        fs, path = fsspec.core.url_to_fs(href)
+        return fs.cat_file(path, start=start, end=end)
+    with open_cached(href) as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def open_dataset(href: str) -> rasterio.io.DatasetReader:
+    """Open a raster with rasterio, routing remote reads via the block cache"""
+    if is_remote(href) and get_block_cache() is not None:
+        return rasterio.open(href, opener=open_cached)
+    return rasterio.open(href)
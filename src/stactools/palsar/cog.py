@@ -1,19 +1,36 @@
 import logging
 import os
+import shutil
+from typing import List, Optional
 
 from rio_cogeo.cogeo import cog_translate  # type: ignore
 from rio_cogeo.profiles import cog_profiles  # type: ignore
 
-# from stactools.palsar.errors import CogifyError
-from stactools.palsar.utils import extract_archive, palsar_folder_parse
+from stactools.palsar import constants as co
+from stactools.palsar.errors import CogifyError, PalsarNameError
+from stactools.palsar.pipeline import BlockConsumer, read_once
+from stactools.palsar.resources import get_resources
+from stactools.palsar.thumbnail import create_thumbnail
+from stactools.palsar.utils import (extract_archive, palsar_folder_parse,
+                                    palsar_name_parse, palsar_sidecar_parse)
 
 logger = logging.getLogger(__name__)
 
 
-def cogify(tile_path: str, output_directory: str):
+def cogify(tile_path: str,
+           output_directory: str,
+           thumbnail: bool = True,
+           cleanup: bool = True,
+           consumers: Optional[List[BlockConsumer]] = None):
     """
     Given tile_path to a tile (1x1 degree) folder or tar.gz?
     Convert each band to a COG, save to output_directory
+    Optionally render a PNG quicklook from the COG overviews
+    With cleanup, each extracted source is deleted as soon as its COG is
+    written, and the extracted folder once all bands are converted
+    With consumers (see pipeline.BlockConsumer), each band is read once
+    block by block and every block is handed to the consumers before the
+    COG is written from that same read
     """
 
     # Extract tar.gz
@@ -22,7 +39,12 @@ def cogify(tile_path: str, output_directory: str):
     # FNF is simpler 1 band
     # collect valid data file names
     src_files = palsar_folder_parse(directory)
-    # Newer years (2019+) has xml file, ignore
+    if not src_files:
+        if cleanup:
+            shutil.rmtree(directory, ignore_errors=True)
+        raise CogifyError(f"No PALSAR band files in {tile_path}")
+    # Newer years (2019+) has xml file, kept as the metadata asset
+    sidecar = palsar_sidecar_parse(directory)
     # Pre 2019, look for .hdr files, then remove hdr for actual file to use
     # for each valid file convert to cog
     cogs = {}
@@ -34,25 +56,14 @@ def cogify(tile_path: str, output_directory: str):
             cog_name = variable
 
         # Extract the Band name
-        var_split = variable.split("_")
-        if len(var_split) == 5:
-            band = var_split[3]
-        else:
-            band = var_split[2]
+        name = palsar_name_parse(variable)
+        band = name.band
+        if not band:
+            raise PalsarNameError(f"{variable} is not a PALSAR band file")
 
-        if int(var_split[1]) >= 17:
+        if name.yy >= 17:
             # NoData value changed in 2017 from 0 to 1, Revision M
-            # TODO: mask band value of 0 is better for setting NoData
-            # TODO: deduplicate with stac.py
-            nodata_by_band = {
-                "HH": 1,
-                "HV": 1,
-                "mask": 0,
-                "linci": 1,
-                "date": 1,
-                "C": 0
-            }
-            nodata = nodata_by_band.get(band)
+            nodata = co.ALOS_NODATA_BY_BAND.get(band)
         else:
             nodata = 0
 
@@ -61,27 +72,66 @@ def cogify(tile_path: str, output_directory: str):
         infile = os.path.join(directory, variable)
 
         output_profile = cog_profiles.get("deflate")
-        output_profile.update(dict(BIGTIFF="IF_SAFER"))
+        output_profile.update(
+            dict(BIGTIFF="IF_SAFER",
+                 blockxsize=co.ALOS_COG_BLOCKSIZE,
+                 blockysize=co.ALOS_COG_BLOCKSIZE))
 
         # Dataset Open option (see gdalwarp `-oo` option)
+        # Threads and block cache follow the CPU/memory limits of the
+        # container and the number of tiles converted concurrently
         config = dict(
-            GDAL_NUM_THREADS="ALL_CPUS",
+            **get_resources().gdal_config(),
             GDAL_TIFF_INTERNAL_MASK=True,
-            GDAL_TIFF_OVR_BLOCKSIZE="128",
+            GDAL_TIFF_OVR_BLOCKSIZE=str(co.ALOS_COG_OVERVIEW_BLOCKSIZE),
         )
 
-        cog_translate(
-            infile,
-            outfile,
-            output_profile,
-            config=config,
-            in_memory=None,
-            quiet=False,
-            nodata=nodata,
-        )
+        if consumers:
+            with read_once(infile, band, nodata, consumers) as source:
+                cog_translate(
+                    source,
+                    outfile,
+                    output_profile,
+                    config=config,
+                    in_memory=None,
+                    quiet=False,
+                    nodata=nodata,
+                )
+        else:
+            cog_translate(
+                infile,
+                outfile,
+                output_profile,
+                config=config,
+                in_memory=None,
+                quiet=False,
+                nodata=nodata,
+            )
 
         logging.info("Wrote out to " + outfile)
         cogs[band] = outfile
 
+        if cleanup:
+            # Free scratch space before converting the next band
+            for path in (infile, f"{infile}.hdr"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    if sidecar:
+        metadata = os.path.join(output_directory, os.path.basename(sidecar))
+        shutil.copyfile(sidecar, metadata)
+        cogs["metadata"] = metadata
+
+    if thumbnail and cogs:
+        png_name = f"{os.path.basename(directory)}.png"
+        png = create_thumbnail(cogs,
+                               palsar_name_parse(directory).yy,
+                               os.path.join(output_directory, png_name))
+        if png:
+            cogs["thumbnail"] = png
+
+    if cleanup:
+        shutil.rmtree(directory, ignore_errors=True)
+
     # return dict of cogs by band
     return cogs
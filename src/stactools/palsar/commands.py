@@ -1,15 +1,18 @@
 import logging
 import os
+from typing import Dict, List, Optional
 
 import click
 
-from stactools.palsar import cog, stac
-
 logger = logging.getLogger(__name__)
 
 
 def create_palsar_command(cli):
-    """Creates the stactools-palsar command line utility."""
+    """Creates the stactools-palsar command line utility.
+
+    Heavy modules (rasterio, rio-cogeo, pystac) are imported inside each
+    command so registering the plugin stays cheap.
+    """
 
     @cli.group(
         "palsar",
@@ -39,6 +42,8 @@ def create_palsar_command(cli):
             destination (str): Path (local or HREF/URL) for the Collection JSON
             url (str): Optional base HREF/URL inside the JSON links
         """
+        from stactools.palsar import stac
+
         collection = stac.create_collection(product)
         json_path = os.path.join(destination, f'{collection.id}.json')
         collection.set_self_href(
@@ -72,13 +77,16 @@ def create_palsar_command(cli):
             cogify (bool): Optional True/False to convert to COG
             url (str): Optional base HREF/URL inside the JSON links
         """
+        from stactools.palsar import cog, stac
+        from stactools.palsar.utils import palsar_name_parse
+
         if cogify:
             cogs = cog.cogify(source, destination)
         else:
             cogs = {'cog': source}
 
         item = stac.create_item(cogs, url)
-        json_file = '_'.join((os.path.basename(source)).split("_")[0:3])
+        json_file = palsar_name_parse(source).stem
         json_path = os.path.join(destination, f'{json_file}.json')
         item.set_self_href(os.path.join(url, os.path.basename(json_path)))
         # TODO: gracefully fail if validate doesn't work
@@ -87,4 +95,259 @@ def create_palsar_command(cli):
 
         return cogs
 
+    @palsar.command("backfill",
+                    short_help="Process tiles recorded in a work ledger")
+    @click.argument("ledger")
+    @click.argument("destination")
+    @click.argument("sources", nargs=-1)
+    @click.option("-f",
+                  "--sources-file",
+                  type=click.File("r"),
+                  help="File with one source HREF per line")
+    @click.option("-u",
+                  "--url",
+                  default='',
+                  type=str,
+                  help="Root HREF/URL to prepend to all records")
+    @click.option("-w",
+                  "--workers",
+                  default=None,
+                  type=int,
+                  help=("Number of tiles to process concurrently "
+                        "(default: what the CPU and memory limits allow)"))
+    @click.option("--retry-failed",
+                  is_flag=True,
+                  help="Only reprocess tiles that failed previously")
+    @click.option("--scratch-dir",
+                  default=None,
+                  type=str,
+                  help="Directory for temporary per-tile files")
+    @click.option("--scratch-budget",
+                  default=None,
+                  type=int,
+                  help="Scratch disk budget in bytes (default: free space)")
+    def backfill_command(ledger: str, destination: str, sources: List[str],
+                         sources_file, url: str, workers: int,
+                         retry_failed: bool, scratch_dir: str,
+                         scratch_budget: int):
+        """Resumable backfill of tile archives
+
+        Tiles are tracked in a SQLite ledger; rerunning resumes where a
+        previous run stopped and never redoes completed tiles.
+
+        Args:
+            ledger (str): Path to the SQLite work ledger
+            destination (str): Directory (local or fsspec URL) for outputs
+            sources (list): Tile archive HREFs to add to the ledger
+            sources_file (file): File with one source HREF per line
+            url (str): Optional base HREF/URL inside the JSON links
+            workers (int): Number of tiles to process concurrently
+            retry_failed (bool): Only reprocess tiles that failed
+            scratch_dir (str): Directory for temporary per-tile files
+            scratch_budget (int): Scratch disk budget in bytes
+        """
+        from stactools.palsar import backfill
+
+        sources = list(sources)
+        if sources_file:
+            sources.extend(line.strip() for line in sources_file
+                           if line.strip())
+        counts = backfill.run_backfill(ledger,
+                                       destination,
+                                       sources,
+                                       url=url,
+                                       workers=workers,
+                                       retry_failed=retry_failed,
+                                       scratch_dir=scratch_dir,
+                                       scratch_budget=scratch_budget)
+        click.echo(", ".join(f"{status}: {n}"
+                             for status, n in sorted(counts.items())))
+
+        return counts
+
+    @palsar.command("build-timeseries",
+                    short_help="Stack all years of a tile into one item")
+    @click.argument("items", nargs=-1, required=True)
+    @click.argument("destination")
+    @click.option("-v",
+                  "--variable",
+                  "variables",
+                  multiple=True,
+                  help="Band to stack (repeatable), default HH HV mask date")
+    @click.option("-u",
+                  "--url",
+                  default='',
+                  type=str,
+                  help="Root HREF/URL to prepend to all records")
+    @click.option("-w",
+                  "--workers",
+                  default=None,
+                  type=int,
+                  help="Number of threads reading the yearly COGs")
+    def build_timeseries_command(items: List[str], destination: str,
+                                 variables: List[str], url: str, workers: int):
+        """Creates multi-year time series COGs and their STAC Item
+
+        Args:
+            items (list): HREFs of the yearly MOS STAC Items of one tile
+            destination (str): Directory for the COGs and the Item JSON
+            variables (list): Bands to stack
+            url (str): Optional base HREF/URL inside the JSON links
+            workers (int): Number of threads reading the yearly COGs
+        """
+        import pystac
+
+        from stactools.palsar import timeseries
+        from stactools.palsar.utils import palsar_name_parse
+
+        yearly = [pystac.Item.from_file(href) for href in items]
+        tiles = {palsar_name_parse(item.id).tile for item in yearly}
+        if len(tiles) != 1:
+            raise click.BadParameter(f"Items span several tiles: {tiles}")
+        tile = tiles.pop()
+
+        cogs_by_year = timeseries.items_by_year(yearly)
+        cubes = timeseries.build_timeseries(cogs_by_year, destination, tile,
+                                            list(variables) or None, workers)
+        item = timeseries.create_timeseries_item(cubes, tile,
+                                                 list(cogs_by_year), url)
+        json_path = os.path.join(destination, f'{item.id}.json')
+        item.set_self_href(os.path.join(url, os.path.basename(json_path)))
+        item.validate()
+        item.save_object(dest_href=json_path)
+
+        return cubes
+
+    @palsar.command("build-index",
+                    short_help="Create a kerchunk reference index of COGs")
+    @click.argument("sources", nargs=-1, required=True)
+    @click.argument("destination")
+    @click.option("-w",
+                  "--workers",
+                  default=16,
+                  type=int,
+                  help="Number of COG headers read concurrently")
+    def build_index_command(sources: List[str], destination: str,
+                            workers: int):
+        """Creates a kerchunk reference JSON over the global tile grid
+
+        Args:
+            sources (list): COG HREFs, directories or glob patterns
+            destination (str): HREF of the reference JSON to write
+            workers (int): Number of COG headers read concurrently
+        """
+        from stactools.palsar import index
+
+        hrefs = index.expand_sources(sources)
+        references = index.build_reference_index(hrefs, workers)
+        index.write_reference_index(references, destination)
+        click.echo(f"Indexed {len(hrefs)} COGs into {destination}")
+
+        return references
+
+    @palsar.command("update-items",
+                    short_help="Rewrite items whose metadata changed")
+    @click.argument("sources", nargs=-1, required=True)
+    @click.option("-w",
+                  "--workers",
+                  default=16,
+                  type=int,
+                  help="Number of items processed concurrently")
+    @click.option("-n",
+                  "--dry-run",
+                  is_flag=True,
+                  help="Only report the items that would change")
+    def update_items_command(sources: List[str], workers: int, dry_run: bool):
+        """Regenerates existing item JSONs with the current create_item
+        and rewrites only those that changed
+
+        Tile geometry and sidecar properties are taken from the existing
+        items, no COG is opened.
+
+        Args:
+            sources (list): Item JSON HREFs, directories or glob patterns
+            workers (int): Number of items processed concurrently
+            dry_run (bool): Only report the items that would change
+        """
+        from stactools.palsar import index, update
+
+        hrefs = index.expand_sources(sources, "*.json")
+        counts: Dict[str, int] = {}
+        for href, status, changes in update.iter_update_items(
+                hrefs, workers, dry_run):
+            counts[status] = counts.get(status, 0) + 1
+            if status != update.UNCHANGED:
+                click.echo(f"{status} {href}: {', '.join(changes)}")
+        click.echo(", ".join(f"{status}: {n}"
+                             for status, n in sorted(counts.items())))
+
+        return counts
+
+    @palsar.command("validate-cogs",
+                    short_help="Check the layout of COGs from their headers")
+    @click.argument("sources", nargs=-1, required=True)
+    @click.option("-w",
+                  "--workers",
+                  default=16,
+                  type=int,
+                  help="Number of COG headers read concurrently")
+    @click.option("--block-size",
+                  type=int,
+                  help="Expected tile size of the full resolution image "
+                  "(default: the cogify tile size)")
+    @click.option("--overview-block-size",
+                  type=int,
+                  help="Expected tile size of the overviews "
+                  "(default: the cogify overview tile size)")
+    @click.option("--no-nodata",
+                  is_flag=True,
+                  help="Don't check nodata against the band and year")
+    @click.option("-o",
+                  "--output",
+                  type=click.File("w"),
+                  help="Write the violations of each invalid COG as JSON")
+    def validate_cogs_command(sources: List[str], workers: int,
+                              block_size: Optional[int],
+                              overview_block_size: Optional[int],
+                              no_nodata: bool, output):
+        """Checks COG layout (ghost area, IFD order, tiles, overviews,
+        nodata) reading only the TIFF headers, exits 1 on any violation
+
+        Args:
+            sources (list): COG HREFs, directories or glob patterns
+            workers (int): Number of COG headers read concurrently
+            block_size (int): Expected full resolution tile size
+            overview_block_size (int): Expected overview tile size
+            no_nodata (bool): Skip the nodata check
+            output (file): JSON report of the invalid COGs
+        """
+        import json
+
+        from stactools.palsar import constants as co
+        from stactools.palsar import index, validate
+
+        if block_size is None:
+            block_size = co.ALOS_COG_BLOCKSIZE
+        if overview_block_size is None:
+            overview_block_size = co.ALOS_COG_OVERVIEW_BLOCKSIZE
+        hrefs = index.expand_sources(sources)
+        invalid = {}
+        for href, violations in validate.iter_cog_violations(
+                hrefs,
+                workers,
+                block_size=block_size,
+                overview_block_size=overview_block_size,
+                check_nodata=not no_nodata):
+            if violations:
+                invalid[href] = violations
+                click.echo(f"{href}: {'; '.join(violations)}")
+        if output:
+            json.dump(invalid, output, indent=2)
+        if invalid:
+            raise click.ClickException(
+                f"{len(invalid)} of {len(hrefs)} COGs have layout violations")
+        click.echo(f"{len(hrefs)} COGs are valid")
+
+        return invalid
+
     return palsar
@@ -1,33 +1,38 @@
 from datetime import datetime
 from typing import Optional
 
-from pystac import Link, Provider
+from pystac import Link, MediaType, Provider
 from pystac import ProviderRole as PR
 from pystac.extensions import sar
 from pystac.extensions.item_assets import AssetDefinition
 from pystac.extensions.raster import DataType
 from pystac.utils import str_to_datetime
 
-# TODO: These values apply to data from 2015 and newer,
-# review and adjust if implementing older data.
+# PALSAR (ALOS) mosaics cover 2007-2010, PALSAR-2 (ALOS-2) 2015 onwards,
+# there is no data for 2011-2014
 
 # Time must be in UTC
 ALOS_MOS_COLLECTION_START: Optional[datetime] = str_to_datetime(
-    "2015-01-01T00:00:00Z")
+    "2007-01-01T00:00:00Z")
 ALOS_MOS_COLLECTION_END: Optional[datetime] = str_to_datetime(
     "2020-12-31T23:59:59Z")
 ALOS_FNF_COLLECTION_START: Optional[datetime] = str_to_datetime(
-    "2015-01-01T00:00:00Z")
+    "2007-01-01T00:00:00Z")
 ALOS_FNF_COLLECTION_END: Optional[datetime] = str_to_datetime(
     "2016-12-31T23:59:59Z")
 ALOS_MOS_TEMPORAL_EXTENT = [ALOS_MOS_COLLECTION_START, ALOS_MOS_COLLECTION_END]
 ALOS_FNF_TEMPORAL_EXTENT = [ALOS_FNF_COLLECTION_START, ALOS_FNF_COLLECTION_END]
 ALOS_SPATIAL_EXTENT = [[-180., -56., 180., 85.]]
+# Tiles are 1x1 degree, named after their upper left (north west) corner
+ALOS_TILE_DEGREES = 1
+ALOS_GLOBAL_GRID_ORIGIN = (-180, 85)  # west, north
+ALOS_GLOBAL_GRID_SHAPE = (141, 360)  # tile rows, tile columns
 ALOS_PALSAR_PLATFORMS = ["ALOS", "ALOS-2"]
 ALOS_PALSAR_INSTRUMENTS = ["PALSAR", "PALSAR-2"]
 ALOS_PALSAR_GSD = 25  # meters
 ALOS_PALSAR_EPSG = 4326
 ALOS_PALSAR_CF = "83.0 dB"
+ALOS_PALSAR_CF_DB = -83.0  # dB = 10 * log10(DN^2) + CF
 ALOS_PALSAR_PROVIDERS = [
     Provider("Japan Aerospace Exploration Agency",
              roles=[PR.PRODUCER, PR.PROCESSOR, PR.LICENSOR],
@@ -60,6 +65,27 @@ ALOS_POLARIZATIONS = [sar.Polarization.HH, sar.Polarization.HV]
 ALOS_INSTRUMENT_MODE = "FBD"  # Fine Beam Dual mode
 ALOS_PRODUCT_TYPE = "GTC"  # Geometric Terrain Corrected
 
+ALOS_THUMBNAIL_ASSET = AssetDefinition({
+    "title": "Thumbnail",
+    "type": "image/png",
+    "description": "Quicklook generated from the COG overviews.",
+    "role": "thumbnail"
+})
+# Tiles from 2019 onwards come with an XML sidecar (CARD4L NRB metadata)
+ALOS_METADATA_ASSET = AssetDefinition({
+    "title": "Metadata",
+    "type": "application/xml",
+    "description": "Tile metadata from JAXA (2019 onwards).",
+    "role": "metadata"
+})
+ALOS_PROCESSING_EXTENSION = (
+    "https://stac-extensions.github.io/processing/v1.1.0/schema.json")
+# Assets that are not rasters: key, media type and roles
+ALOS_AUXILIARY_ASSETS = {
+    "thumbnail": (MediaType.PNG, ["thumbnail"]),
+    "metadata": (MediaType.XML, ["metadata"]),
+}
+
 ALOS_MOS_ASSETS = {
     "HH":
     AssetDefinition({
@@ -98,6 +124,10 @@ ALOS_MOS_ASSETS = {
         "description": "Quality Mask",
         "role": "data-mask"
     }),
+    "thumbnail":
+    ALOS_THUMBNAIL_ASSET,
+    "metadata":
+    ALOS_METADATA_ASSET,
 }
 
 ALOS_FNF_ASSETS = {
@@ -107,7 +137,30 @@ ALOS_FNF_ASSETS = {
         "type": "image/tiff; application=geotiff; profile=cloud-optimized",
         "description": "Forest vs Non-Forest classification",
         "role": "data"
-    })
+    }),
+    "thumbnail":
+    ALOS_THUMBNAIL_ASSET,
+    "metadata":
+    ALOS_METADATA_ASSET,
+}
+
+# Quicklook rendering, width/height in pixels and stretch ranges in dB
+ALOS_THUMBNAIL_SIZE = 512
+ALOS_THUMBNAIL_HH_RANGE = (-25.0, -3.0)
+ALOS_THUMBNAIL_HV_RANGE = (-30.0, -8.0)
+ALOS_THUMBNAIL_RATIO_RANGE = (2.0, 15.0)
+
+# FNF class colors (RGB), class values changed with the 2017 revision
+ALOS_FNF_COLORS_PRE_2017 = {
+    1: (0, 100, 0),  # Forest
+    2: (255, 255, 153),  # Non-Forest
+    3: (0, 0, 255),  # Water
+}
+ALOS_FNF_COLORS = {
+    1: (0, 100, 0),  # Dense Forest
+    2: (131, 239, 98),  # Non-dense Forest
+    3: (255, 255, 153),  # Non-Forest
+    4: (0, 0, 255),  # Water
 }
 
 ALOS_BANDS = {
@@ -130,3 +183,26 @@ ALOS_BANDS = {
         "data_type": DataType.UINT8,
     },
 }
+
+# NoData value changed in 2017 from 0 to 1, Revision M
+# TODO: mask band value of 0 is better for setting NoData
+ALOS_NODATA_BY_BAND = {
+    "HH": 1,
+    "HV": 1,
+    "mask": 0,
+    "linci": 1,
+    "date": 1,
+    "C": 0
+}
+
+# Layout of the COGs written by cogify: internal tile size of the full
+# resolution image and of the overviews in pixels, TIFF compression code
+ALOS_COG_BLOCKSIZE = 512
+ALOS_COG_OVERVIEW_BLOCKSIZE = 128
+ALOS_COG_COMPRESSION = 8  # deflate
+
+# Multi-year stacks: bands per variable and internal tile size in pixels,
+# small pixel-interleaved tiles keep a pixel's time series in one read
+ALOS_TIMESERIES_VARIABLES = ["HH", "HV", "mask", "date"]
+ALOS_TIMESERIES_BLOCKSIZE = 256
+ALOS_TIMESERIES_READ_SIZE = 512
@@ -0,0 +1,230 @@
+import os
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from rasterio.crs import CRS  # type: ignore
+from rasterio.transform import Affine  # type: ignore
+from rasterio.windows import Window  # type: ignore
+
+from stactools.palsar.errors import EnviHeaderError
+
+# ENVI "data type" code: numpy type
+ENVI_DTYPES = {
+    1: "u1",
+    2: "i2",
+    3: "i4",
+    4: "f4",
+    5: "f8",
+    12: "u2",
+    13: "u4",
+    14: "i8",
+    15: "u8",
+}
+
+# Map info units: factor to degrees
+_ANGLE_UNITS = {"degrees": 1.0, "seconds": 1 / 3600, "minutes": 1 / 60}
+
+_FIELD = re.compile(r"^\s*([^=\n]+?)\s*=\s*(\{[^}]*\}|[^\n]*)", re.MULTILINE)
+
+
+class MapInfo(NamedTuple):
+    projection: str
+    reference_pixel: Tuple[float, float]  # 1-based (x, y)
+    reference_coordinate: Tuple[float, float]  # (x, y)
+    pixel_size: Tuple[float, float]
+    datum: str
+    units: str
+
+
+class EnviHeader(NamedTuple):
+    samples: int
+    lines: int
+    bands: int
+    header_offset: int
+    data_type: int
+    interleave: str
+    byte_order: int
+    map_info: Optional[MapInfo]
+
+    @property
+    def dtype(self) -> np.dtype:
+        if self.data_type not in ENVI_DTYPES:
+            raise EnviHeaderError(
+                f"Unsupported ENVI data type {self.data_type}")
+        return np.dtype(ENVI_DTYPES[self.data_type]).newbyteorder(
+            ">" if self.byte_order == 1 else "<")
+
+
+def _split_braces(value: str) -> List[str]:
+    return [item.strip() for item in value.strip("{}").split(",")]
+
+
+def parse_map_info(value: str) -> MapInfo:
+    fields = _split_braces(value)
+    if len(fields) < 7:
+        raise EnviHeaderError(f"Incomplete map info {value}")
+    units = next((field.split("=", 1)[1]
+                  for field in fields if field.lower().startswith("units=")),
+                 "Degrees")
+    return MapInfo(fields[0], (float(fields[1]), float(fields[2])),
+                   (float(fields[3]), float(fields[4])),
+                   (float(fields[5]), float(fields[6])),
+                   fields[7] if len(fields) > 7 else "", units)
+
+
+def parse_envi_header(text: str) -> EnviHeader:
+    """Parse the fields of an ENVI .hdr needed to read its raw file"""
+    if not text.lstrip().startswith("ENVI"):
+        raise EnviHeaderError("Not an ENVI header")
+    fields: Dict[str, str] = {
+        key.strip().lower(): value.strip()
+        for key, value in _FIELD.findall(text)
+    }
+    try:
+        return EnviHeader(
+            samples=int(fields["samples"]),
+            lines=int(fields["lines"]),
+            bands=int(fields.get("bands", 1)),
+            header_offset=int(fields.get("header offset", 0)),
+            data_type=int(fields["data type"]),
+            interleave=fields.get("interleave", "bsq").lower(),
+            byte_order=int(fields.get("byte order", 0)),
+            map_info=parse_map_info(fields["map info"])
+            if "map info" in fields else None,
+        )
+    except (KeyError, ValueError) as e:
+        raise EnviHeaderError(f"Invalid ENVI header: {e}") from e
+
+
+class EnviRaster:
+    """An ENVI raw raster memory-mapped as a (lines, samples) array
+
+    Exposes the parts of a rasterio dataset cogify's block pipeline uses
+    (width, height, dtypes, crs, transform, read) so blocks can be taken
+    straight from the page cache instead of through the GDAL ENVI driver.
+    Only single band (or band sequential) Geographic Lat/Lon files are
+    supported, as shipped in the PALSAR archives.
+    """
+
+    def __init__(self, path: str, header: EnviHeader):
+        if header.bands != 1 and header.interleave != "bsq":
+            raise EnviHeaderError(
+                f"{path}: only band sequential multi-band files are supported")
+        self.name = path
+        self.header = header
+        self.array: Optional[np.memmap] = np.memmap(
+            path,
+            dtype=header.dtype,
+            mode="r",
+            offset=header.header_offset,
+            shape=(header.bands, header.lines, header.samples))
+
+    @property
+    def width(self) -> int:
+        return self.header.samples
+
+    @property
+    def height(self) -> int:
+        return self.header.lines
+
+    @property
+    def count(self) -> int:
+        return self.header.bands
+
+    @property
+    def dtypes(self) -> Tuple[str, ...]:
+        # rasterio style names, always native byte order once read
+        return (self.header.dtype.newbyteorder("=").name, ) * self.count
+
+    @property
+    def crs(self) -> Optional[CRS]:
+        map_info = self.header.map_info
+        if map_info is None:
+            return None
+        if not map_info.projection.lower().startswith("geographic"):
+            raise EnviHeaderError(
+                f"{self.name}: unsupported projection {map_info.projection}")
+        return CRS.from_epsg(4326)
+
+    @property
+    def transform(self) -> Affine:
+        map_info = self.header.map_info
+        if map_info is None:
+            return Affine.identity()
+        scale = _ANGLE_UNITS.get(map_info.units.lower())
+        if scale is None:
+            raise EnviHeaderError(
+                f"{self.name}: unsupported map units {map_info.units}")
+        (ref_x, ref_y), (x, y) = (map_info.reference_pixel,
+                                  map_info.reference_coordinate)
+        x_size, y_size = (size * scale for size in map_info.pixel_size)
+        # The reference pixel is 1-based, its coordinate is its upper left
+        west = x * scale - (ref_x - 1) * x_size
+        north = y * scale + (ref_y - 1) * y_size
+        return Affine(x_size, 0.0, west, 0.0, -y_size, north)
+
+    def view(self, band: int = 1, window: Optional[Window] = None):
+        """Read-only array over the mapped file, without copying"""
+        if self.array is None:
+            raise ValueError(f"{self.name} is closed")
+        data = self.array[band - 1]
+        if window is None:
+            return data
+        (row_start, row_stop), (col_start, col_stop) = window.toranges()
+        return data[row_start:row_stop, col_start:col_stop]
+
+    def read(self,
+             band: int = 1,
+             window: Optional[Window] = None,
+             out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Copy a band (window) in native byte order, like rasterio"""
+        data = self.view(band, window)
+        if out is None:
+            return data.astype(data.dtype.newbyteorder("="))
+        np.copyto(out, data)
+        return out
+
+    def iter_blocks(self,
+                    block_size: int) -> Iterator[Tuple[Window, np.ndarray]]:
+        """Windows of block_size and zero-copy views of the first band
+
+        Big-endian files are the exception, each block is byte swapped
+        into a new array.
+        """
+        native = self.header.dtype.isnative
+        for row in range(0, self.height, block_size):
+            for col in range(0, self.width, block_size):
+                window = Window(col, row, min(block_size, self.width - col),
+                                min(block_size, self.height - row))
+                block = self.view(1, window)
+                yield window, block if native else self.read(1, window)
+
+    def close(self) -> None:
+        # The file is unmapped once the last block view is released too,
+        # closing the mmap itself would fail while views are alive
+        self.array = None
+
+    def __enter__(self) -> "EnviRaster":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def envi_header_path(path: str) -> Optional[str]:
+    """The .hdr of an ENVI raw file (file.hdr or file with .hdr suffix)"""
+    for candidate in (f"{path}.hdr", f"{os.path.splitext(path)[0]}.hdr"):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def open_envi(path: str) -> EnviRaster:
+    """Memory-map an ENVI raw file described by its .hdr sidecar"""
+    header_path = envi_header_path(path)
+    if header_path is None:
+        raise EnviHeaderError(f"No ENVI header for {path}")
+    with open(header_path) as f:
+        header = parse_envi_header(f.read())
+    return EnviRaster(path, header)
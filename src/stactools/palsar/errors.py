@@ -1,3 +1,13 @@
 class CogifyError(Exception):
     """Raises if there is an error during cogification."""
     pass
+
+
+class PalsarNameError(ValueError):
+    """Raises if a file name does not follow the PALSAR naming."""
+    pass
+
+
+class EnviHeaderError(ValueError):
+    """Raises if an ENVI header can't be used to read its raw file."""
+    pass
@@ -0,0 +1,189 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import fsspec  # type: ignore
+
+from stactools.palsar import constants as co
+from stactools.palsar.errors import PalsarNameError
+from stactools.palsar.tiff import IFD, TiffError, TiffHeader, read_tiff_header
+from stactools.palsar.utils import palsar_name_parse
+
+logger = logging.getLogger(__name__)
+
+# TIFF compression code: numcodecs compressor config
+COMPRESSORS: Dict[int, Optional[Dict]] = {
+    1: None,
+    8: {
+        "id": "zlib",
+        "level": 6
+    },
+    32946: {
+        "id": "zlib",
+        "level": 6
+    },
+}
+
+
+def _year_band(href: str) -> Optional[Tuple[int, str]]:
+    """Two digit year and band of a COG produced by cogify"""
+    try:
+        name = palsar_name_parse(href)
+    except PalsarNameError:
+        return None
+    if not name.band or name.extension != ".tif":
+        return None
+    return name.yy, name.band
+
+
+def _dtype(ifd: IFD, byte_order: str) -> str:
+    kind = {1: "u", 2: "i", 3: "f"}.get(ifd.sample_format)
+    if kind is None:
+        raise TiffError(f"Unsupported sample format {ifd.sample_format}")
+    size = ifd.bits_per_sample // 8
+    return f"{'|' if size == 1 else byte_order}{kind}{size}"
+
+
+def _zarray(ifd: IFD, header: TiffHeader) -> Dict:
+    if not ifd.is_tiled:
+        raise TiffError(f"{header.href} is not tiled")
+    if ifd.samples_per_pixel != 1:
+        raise TiffError(f"{header.href} has more than one band")
+    if ifd.compression not in COMPRESSORS:
+        raise TiffError(f"{header.href} uses unsupported compression "
+                        f"{ifd.compression}")
+    if ifd.predictor != 1:
+        raise TiffError(f"{header.href} uses a predictor")
+    rows, cols = co.ALOS_GLOBAL_GRID_SHAPE
+    return {
+        "zarr_format": 2,
+        "shape": [rows, cols, ifd.height, ifd.width],
+        "chunks": [1, 1, ifd.tile_height, ifd.tile_width],
+        "dtype": _dtype(ifd, header.byte_order),
+        "compressor": COMPRESSORS[ifd.compression],
+        "fill_value": ifd.nodata,
+        "filters": None,
+        "order": "C",
+    }
+
+
+def grid_position(ifd: IFD) -> Tuple[int, int]:
+    """(row, column) of a 1x1 degree tile in the global PALSAR tile grid"""
+    if ifd.origin is None:
+        raise TiffError("Tile has no GeoTIFF tiepoint")
+    left, top = ifd.origin
+    west, north = co.ALOS_GLOBAL_GRID_ORIGIN
+    return round(north - top), round(left - west)
+
+
+def scan_cogs(hrefs: Iterable[str],
+              workers: int = 16) -> Dict[str, TiffHeader]:
+    """Read the TIFF headers of many COGs concurrently"""
+    hrefs = list(hrefs)
+    with ThreadPoolExecutor(workers) as executor:
+        headers = executor.map(read_tiff_header, hrefs)
+        return dict(zip(hrefs, headers))
+
+
+def build_reference_index(hrefs: Iterable[str], workers: int = 16) -> Dict:
+    """Create a kerchunk (version 1) reference set over PALSAR tile COGs
+
+    Each band of each year becomes a zarr array ``{year}/{band}`` with
+    dimensions (tile_lat, tile_lon, y, x) over the global 1x1 degree tile
+    grid, whose chunks are the internal tiles of the COGs. Chunk references
+    point at the byte ranges of those tiles, so a whole year can be opened
+    without reading any COG header.
+
+    Args:
+        hrefs (list): Paths or fsspec URLs of COGs produced by cogify
+        workers (int): Number of headers read concurrently
+
+    Returns:
+        dict: Reference set, to be serialized as JSON
+    """
+    groups: Dict[Tuple[int, str], List[str]] = {}
+    for href in hrefs:
+        year_band = _year_band(href)
+        if year_band is None:
+            logger.warning(f"Skipping {href}, not a PALSAR tile COG")
+            continue
+        groups.setdefault(year_band, []).append(href)
+
+    headers = scan_cogs([h for group in groups.values() for h in group],
+                        workers)
+
+    west, north = co.ALOS_GLOBAL_GRID_ORIGIN
+    refs: Dict = {
+        ".zgroup":
+        json.dumps({"zarr_format": 2}),
+        ".zattrs":
+        json.dumps({
+            "crs":
+            f"EPSG:{co.ALOS_PALSAR_EPSG}",
+            "grid_origin": [west, north],
+            "tile_degrees":
+            co.ALOS_TILE_DEGREES,
+            "description":
+            ("Tile (tile_lat, tile_lon) covers longitudes west + tile_lon"
+             " to west + tile_lon + 1 and latitudes north - tile_lat - 1"
+             " to north - tile_lat, with (west, north) = grid_origin"),
+        }),
+    }
+    for (year, band), members in sorted(groups.items()):
+        year_key = f"20{year:02d}"
+        if f"{year_key}/.zgroup" not in refs:
+            refs[f"{year_key}/.zgroup"] = json.dumps({"zarr_format": 2})
+        path = f"{year_key}/{band}"
+        zarray = None
+        for href in sorted(members):
+            header = headers[href]
+            ifd = header.images[0]
+            member_zarray = _zarray(ifd, header)
+            if zarray is None:
+                zarray = member_zarray
+                refs[f"{path}/.zarray"] = json.dumps(zarray)
+                refs[f"{path}/.zattrs"] = json.dumps(
+                    {"_ARRAY_DIMENSIONS": ["tile_lat", "tile_lon", "y", "x"]})
+            elif member_zarray != zarray:
+                raise TiffError(f"{href} does not match the layout of the "
+                                f"other {path} COGs")
+            row, col = grid_position(ifd)
+            for index, (offset, size) in enumerate(
+                    zip(ifd.tile_offsets, ifd.tile_byte_counts)):
+                if size == 0:
+                    # Sparse tile, left to the fill value
+                    continue
+                y, x = divmod(index, ifd.tiles_across)
+                refs[f"{path}/{row}.{col}.{y}.{x}"] = [href, offset, size]
+        logger.info(f"Indexed {len(members)} COGs for {path}")
+
+    return {"version": 1, "refs": refs}
+
+
+def expand_sources(sources: Iterable[str],
+                   pattern: str = "*.tif") -> List[str]:
+    """Expand directories and glob patterns (local or fsspec) to HREFs
+
+    Directories are expanded to their files matching pattern, COGs by
+    default.
+    """
+    hrefs = []
+    for source in sources:
+        fs, path = fsspec.core.url_to_fs(source)
+        protocol = source.split("://")[0] + "://" if "://" in source else ""
+        if any(char in path for char in "*?["):
+            matches = fs.glob(path)
+        elif fs.isdir(path):
+            matches = fs.glob(f"{path.rstrip('/')}/{pattern}")
+        else:
+            hrefs.append(source)
+            continue
+        hrefs.extend(f"{protocol}{match}" for match in sorted(matches))
+    return hrefs
+
+
+def write_reference_index(references: Dict, destination: str) -> str:
+    with fsspec.open(destination, "w") as f:
+        json.dump(references, f)
+    return destination
@@ -0,0 +1,157 @@
+import logging
+import math
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import rasterio  # type: ignore
+from rasterio.io import DatasetReader, MemoryFile  # type: ignore
+from rasterio.windows import Window  # type: ignore
+
+from stactools.palsar import constants as co
+from stactools.palsar.envi import EnviRaster, envi_header_path, open_envi
+
+logger = logging.getLogger(__name__)
+
+
+class BlockConsumer(ABC):
+    """Receives every block of a band while cogify reads it
+
+    Subclasses implement consume, and override start/finish to reset and
+    keep their per-band state. Blocks are read-only views of a buffer that
+    is reused for the next block: copy what must outlive the call.
+    """
+
+    def start(self, band: str, profile: Dict) -> None:
+        pass
+
+    @abstractmethod
+    def consume(self, window: Window, block: np.ndarray) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+class BandStatistics(BlockConsumer):
+    """Minimum, maximum, mean, standard deviation and valid percentage of
+    each band, excluding nodata, in the STAC raster statistics layout"""
+
+    def __init__(self):
+        self.statistics: Dict[str, Dict[str, float]] = {}
+
+    def start(self, band: str, profile: Dict) -> None:
+        self._band = band
+        self._nodata = profile.get("nodata")
+        self._total = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+        self._minimum = math.inf
+        self._maximum = -math.inf
+
+    def consume(self, window: Window, block: np.ndarray) -> None:
+        self._total += block.size
+        valid = block if self._nodata is None else block[block != self._nodata]
+        if not valid.size:
+            return
+        values = valid.astype("float64")
+        self._count += values.size
+        self._sum += float(values.sum())
+        self._sum_squares += float(np.square(values).sum())
+        self._minimum = min(self._minimum, float(valid.min()))
+        self._maximum = max(self._maximum, float(valid.max()))
+
+    def finish(self) -> None:
+        statistics = {
+            "valid_percent":
+            100.0 * self._count / self._total if self._total else 0.0
+        }
+        if self._count:
+            mean = self._sum / self._count
+            variance = max(0.0, self._sum_squares / self._count - mean * mean)
+            statistics.update(minimum=self._minimum,
+                              maximum=self._maximum,
+                              mean=mean,
+                              stddev=math.sqrt(variance))
+        self.statistics[self._band] = statistics
+
+
+def iter_blocks(
+    dataset,
+    block_size: int = co.ALOS_COG_BLOCKSIZE
+) -> Iterator[Tuple[Window, np.ndarray]]:
+    """Read the first band of a dataset block by block into one buffer
+
+    An EnviRaster needs no buffer, its blocks are views of the mapped file.
+
+    Yields:
+        tuple: Window and a read-only view of the buffer holding its data,
+            valid until the next block is read
+    """
+    if isinstance(dataset, EnviRaster):
+        yield from dataset.iter_blocks(block_size)
+        return
+    buffer = np.empty(block_size * block_size, dtype=dataset.dtypes[0])
+    for row in range(0, dataset.height, block_size):
+        for col in range(0, dataset.width, block_size):
+            window = Window(col, row, min(block_size, dataset.width - col),
+                            min(block_size, dataset.height - row))
+            # A contiguous prefix of the buffer, as rasterio reads into it
+            block = buffer[:window.height * window.width].reshape(
+                window.height, window.width)
+            dataset.read(1, window=window, out=block)
+            view = block.view()
+            view.flags.writeable = False
+            yield window, view
+
+
+@contextmanager
+def read_once(infile: str, band: str, nodata: Optional[float],
+              consumers: List[BlockConsumer]) -> Iterator[DatasetReader]:
+    """Read a source band once, feeding its blocks to consumers
+
+    The blocks are also copied into an uncompressed in-memory GeoTIFF,
+    yielded for cog_translate, so converting the band doesn't read the
+    source again. That copy is a second full band in the worker's memory
+    (about 40 MB for a 4500x4500 uint16 tile), plan workers with
+    resources.plan_resources(block_pipeline=True) when using it. ENVI raw
+    sources (pre 2019) are memory-mapped rather than read through the GDAL
+    ENVI driver.
+
+    Args:
+        infile (str): Source raster
+        band (str): Band name passed to the consumers
+        nodata (float): Nodata value of the COG
+        consumers (list): Block consumers
+
+    Yields:
+        DatasetReader: In-memory copy of the band
+    """
+    block_size = co.ALOS_COG_BLOCKSIZE
+    opener = open_envi if envi_header_path(infile) else rasterio.open
+    with opener(infile) as src, MemoryFile() as memfile:
+        profile = dict(driver="GTiff",
+                       width=src.width,
+                       height=src.height,
+                       count=1,
+                       dtype=src.dtypes[0],
+                       crs=src.crs,
+                       transform=src.transform,
+                       nodata=nodata,
+                       tiled=True,
+                       blockxsize=block_size,
+                       blockysize=block_size)
+        for consumer in consumers:
+            consumer.start(band, profile)
+        with memfile.open(**profile) as dst:
+            for window, block in iter_blocks(src, block_size):
+                for consumer in consumers:
+                    consumer.consume(window, block)
+                dst.write(block, 1, window=window)
+            for consumer in consumers:
+                consumer.finish()
+        logger.debug(f"Read {infile} once for {len(consumers)} consumers")
+        with memfile.open() as source:
+            yield source
@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+ENV_WORKERS = "PALSAR_WORKERS"
+ENV_GDAL_THREADS = "PALSAR_GDAL_NUM_THREADS"
+ENV_GDAL_CACHEMAX = "PALSAR_GDAL_CACHEMAX"  # MB
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Memory a cogify worker needs besides the GDAL block cache: interpreter,
+# rasterio/rio-cogeo and the windows being compressed
+WORKER_OVERHEAD = 384 * 1024**2  # bytes
+MIN_GDAL_CACHE = 64 * 1024**2  # bytes
+# Uncompressed in-memory copy of a band cogify keeps while block consumers
+# are used (pipeline.read_once), a 4500x4500 uint16 tile
+PIPELINE_BAND_COPY = 4500 * 4500 * 2  # bytes
+# A whole 4500x4500 band plus its overviews fits in this
+MAX_GDAL_CACHE = 1024 * 1024**2  # bytes
+# Part of the memory limit handed to workers, the rest is headroom for
+# the page cache and allocator fragmentation
+MEMORY_FRACTION = 0.75
+
+_resources: Optional["Resources"] = None
+_lock = threading.Lock()
+
+
+class Resources(NamedTuple):
+    """Worker pool size and GDAL settings for the available resources"""
+    cpus: int
+    memory: int  # bytes
+    workers: int
+    gdal_threads: int
+    gdal_cachemax: int  # bytes
+
+    def gdal_config(self) -> Dict[str, Any]:
+        """GDAL config options for one worker, for rasterio.Env
+
+        GDAL_NUM_THREADS or GDAL_CACHEMAX set in the environment are left
+        to GDAL, so they keep precedence.
+        """
+        config = {
+            "GDAL_NUM_THREADS": str(self.gdal_threads),
+            # rasterio applies this with GDALSetCacheMax64, in bytes
+            "GDAL_CACHEMAX": self.gdal_cachemax,
+        }
+        return {
+            key: value
+            for key, value in config.items() if key not in os.environ
+        }
+
+
+def _read_cgroup(cgroup_root: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(cgroup_root, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit(cgroup_root: str = CGROUP_ROOT) -> int:
+    """Number of CPUs this process may use
+
+    The smaller of the CPU affinity mask and the cgroup (v2 or v1) CPU
+    quota, rounded up; os.cpu_count() reports the host's CPUs instead.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    quota, period = None, None
+    cpu_max = _read_cgroup(cgroup_root, "cpu.max")
+    if cpu_max:
+        # v2: "<quota> <period>" or "max <period>"
+        fields = cpu_max.split()
+        if fields[0] != "max":
+            quota, period = int(fields[0]), int(fields[1])
+    else:
+        v1_quota = _read_cgroup(cgroup_root, "cpu/cpu.cfs_quota_us")
+        v1_period = _read_cgroup(cgroup_root, "cpu/cpu.cfs_period_us")
+        if v1_quota and v1_period and int(v1_quota) > 0:
+            quota, period = int(v1_quota), int(v1_period)
+
+    if quota and period:
+        cpus = min(cpus, max(1, -(-quota // period)))
+    return cpus
+
+
+def memory_limit(cgroup_root: str = CGROUP_ROOT) -> int:
+    """Memory in bytes this process may use
+
+    The smaller of the physical memory and the cgroup (v2 or v1) limit.
+    """
+    memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    limit = (_read_cgroup(cgroup_root, "memory.max")
+             or _read_cgroup(cgroup_root, "memory/memory.limit_in_bytes"))
+    # v2 reports "max" without a limit, v1 a number close to 2**63
+    if limit and limit.isdigit():
+        memory = min(memory, int(limit))
+    return memory
+
+
+def plan_resources(workers: Optional[int] = None,
+                   gdal_threads: Optional[int] = None,
+                   gdal_cachemax: Optional[int] = None,
+                   cpus: Optional[int] = None,
+                   memory: Optional[int] = None,
+                   block_pipeline: bool = False) -> Resources:
+    """Choose the worker count, GDAL threads and GDAL cache size together
+
+    Workers are bounded by the CPUs and by how many fit in the memory
+    limit with a minimal GDAL cache; the CPUs left are shared out as GDAL
+    threads and the memory as GDAL cache. Any value passed in is kept and
+    the others are derived from it.
+
+    Args:
+        workers (int): Number of tiles processed concurrently
+        gdal_threads (int): GDAL_NUM_THREADS of each worker
+        gdal_cachemax (int): GDAL block cache of each worker in bytes
+        cpus (int): Available CPUs, detected from cgroups by default
+        memory (int): Available memory in bytes, detected by default
+        block_pipeline (bool): Workers run cogify with block consumers and
+            hold an extra in-memory copy of each band
+
+    Returns:
+        Resources: The chosen settings
+    """
+    cpus = cpus or cpu_limit()
+    memory = memory or memory_limit()
+    budget = int(memory * MEMORY_FRACTION)
+    overhead = WORKER_OVERHEAD + (PIPELINE_BAND_COPY if block_pipeline else 0)
+
+    if workers is None:
+        fit = budget // (overhead + (gdal_cachemax or MIN_GDAL_CACHE))
+        workers = max(1, min(cpus, fit))
+    if gdal_threads is None:
+        gdal_threads = max(1, cpus // workers)
+    if gdal_cachemax is None:
+        share = budget // workers - overhead
+        gdal_cachemax = min(MAX_GDAL_CACHE, max(MIN_GDAL_CACHE, share))
+
+    if workers * (overhead + gdal_cachemax) > memory:
+        logger.warning(f"{workers} workers with a {gdal_cachemax} byte GDAL"
+                       f" cache may exceed the {memory} byte memory limit")
+    return Resources(cpus, memory, workers, gdal_threads, gdal_cachemax)
+
+
+def resources_from_env(workers: Optional[int] = None,
+                       block_pipeline: bool = False) -> Resources:
+    """Plan the settings, taking overrides from PALSAR_WORKERS,
+    PALSAR_GDAL_NUM_THREADS and PALSAR_GDAL_CACHEMAX (MB)
+
+    Args:
+        workers (int): Number of workers, takes precedence over the
+            environment
+        block_pipeline (bool): Workers run cogify with block consumers
+
+    Returns:
+        Resources: The chosen settings
+    """
+    cachemax = os.environ.get(ENV_GDAL_CACHEMAX)
+    return plan_resources(workers or _env_int(ENV_WORKERS),
+                          _env_int(ENV_GDAL_THREADS),
+                          int(cachemax) * 1024**2 if cachemax else None,
+                          block_pipeline=block_pipeline)
+
+
+def configure_resources(resources: Optional[Resources]) -> None:
+    """Use these settings in this process (None detects them again)
+
+    Overrides the PALSAR_WORKERS, PALSAR_GDAL_* environment variables.
+    """
+    global _resources
+    with _lock:
+        _resources = resources
+
+
+def get_resources() -> Resources:
+    """Return the active settings, planning them from the environment
+
+    Unless a pool configured them (configure_resources) or PALSAR_WORKERS
+    is set, this process is planned as the only worker, so a lone cogify
+    gets all the CPUs and the memory budget.
+    """
+    global _resources
+    with _lock:
+        if _resources is None:
+            _resources = resources_from_env(_env_int(ENV_WORKERS) or 1)
+            logger.debug(f"Planned resources {_resources}")
+    return _resources
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
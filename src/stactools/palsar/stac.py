@@ -1,8 +1,9 @@
 import logging
 import os
-from typing import Dict
+from typing import Dict, Optional
 
-import rasterio  # type: ignore
+import fsspec  # type: ignore
+import stactools.core
 from dateutil.parser import isoparse
 from pystac import (Asset, CatalogType, Collection, Extent, Item, Link,
                     MediaType, SpatialExtent, Summaries, TemporalExtent)
@@ -14,9 +15,13 @@ from pystac.extensions.version import VersionExtension
 from shapely.geometry import box, mapping  # type: ignore
 
 from stactools.palsar import constants as co
+from stactools.palsar.cache import open_dataset
+from stactools.palsar.utils import palsar_metadata_parse, palsar_name_parse
 
 logger = logging.getLogger(__name__)
 
+stactools.core.use_fsspec()
+
 
 def create_collection(product: str) -> Collection:
     """Create a STAC Collection
@@ -92,7 +97,24 @@ def create_collection(product: str) -> Collection:
     return collection
 
 
-def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
+def read_raster_info(href: str) -> Dict:
+    """Bounds, transform and shape of a raster, as used by create_item"""
+    with open_dataset(href) as dataset:
+        if dataset.crs.to_epsg() != 4326:
+            raise ValueError(
+                f"Dataset {href} is not EPSG:4326, which is required for ALOS data"
+            )
+        return {
+            "bbox": list(dataset.bounds),
+            "transform": list(dataset.transform),
+            "shape": list(dataset.shape),
+        }
+
+
+def create_item(assets_hrefs: Dict,
+                root_href: str = '',
+                raster_info: Optional[Dict] = None,
+                metadata: Optional[Dict] = None) -> Item:
     """Create a STAC Item
 
     This function should include logic to extract all relevant metadata from an
@@ -102,31 +124,33 @@ def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
 
     Args:
         assets_hrefs (dict): The HREF pointing to an asset associated with the item
+        root_href (str): Optional base HREF/URL for the assets and links
+        raster_info (dict): bbox, transform and shape of the tile, read from
+            the first raster asset when not given
+        metadata (dict): Properties from the XML sidecar, read from the
+            metadata asset when not given
 
     Returns:
         Item: STAC Item object
     """
 
-    # Get the general parameters from the first asset
-    asset_href = list(assets_hrefs.values())[0]
-    year = os.path.basename(asset_href).split("_")[1]
-    item_root = '_'.join((os.path.basename(asset_href)).split("_")[0:2])
+    # Get the general parameters from the first raster asset
+    asset_href = next(href for key, href in assets_hrefs.items()
+                      if key not in co.ALOS_AUXILIARY_ASSETS)
+    name = palsar_name_parse(asset_href)
 
-    with rasterio.open(asset_href) as dataset:
-        if dataset.crs.to_epsg() != 4326:
-            raise ValueError(
-                f"Dataset {asset_href} is not EPSG:4326, which is required for ALOS data"
-            )
-        bbox = list(dataset.bounds)
-        geometry = mapping(box(*bbox))
-        transform = list(dataset.transform)
-        shape = dataset.shape
+    if raster_info is None:
+        raster_info = read_raster_info(asset_href)
+    bbox = list(raster_info["bbox"])
+    geometry = mapping(box(*bbox))
+    transform = list(raster_info["transform"])
+    shape = list(raster_info["shape"])
 
-    start_datetime = f"20{year}-01-01T00:00:00Z"
-    end_datetime = f"20{year}-12-31T23:59:59Z"
+    start_datetime = f"{name.year}-01-01T00:00:00Z"
+    end_datetime = f"{name.year}-12-31T23:59:59Z"
 
-    if os.path.basename(asset_href).split("_")[2] == "C":
-        item_id = f"{item_root}_FNF"
+    item_id = name.stem
+    if name.product == "FNF":
         properties = {
             "title": item_id,
             "description": "Forest/Non-Forest Classification",
@@ -135,7 +159,6 @@ def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
         }
         collection = 'alos-fnf-mosaic'
     else:
-        item_id = f"{item_root}_MOS"
         properties = {
             "title": item_id,
             "description": "Annual PALSAR Mosaic",
@@ -159,7 +182,7 @@ def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
              target=os.path.join(root_href, f"{collection}.json")))
 
     # Data before 2015 is PALSAR, after PALSAR-2
-    if int(year) >= 15:
+    if name.yy >= 15:
         item.common_metadata.platform = co.ALOS_PALSAR_PLATFORMS[1]
         item.common_metadata.instruments = [co.ALOS_PALSAR_INSTRUMENTS[1]]
     else:
@@ -174,7 +197,7 @@ def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
     proj_attrs.shape = shape  # Raster shape
     proj_attrs.transform = transform  # Raster GeoTransform
 
-    if os.path.basename(asset_href).split("_")[2] != "C":
+    if name.product != "FNF":
         # For MOS product use SAR extension
         sar = SarExtension.ext(item, add_if_missing=True)
         sar.frequency_band = co.ALOS_FREQUENCY_BAND
@@ -184,10 +207,32 @@ def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
         # Append Correction Factor to convert DN to dB
         item.properties["cf"] = co.ALOS_PALSAR_CF
 
+    if "metadata" in assets_hrefs:
+        # 2019+ sidecar, read once instead of probing each band
+        if metadata is None:
+            with fsspec.open(assets_hrefs["metadata"], "rb") as f:
+                metadata = palsar_metadata_parse(f.read())
+        item.properties.update(metadata)
+        if any(key.startswith("processing:") for key in metadata):
+            item.stac_extensions.append(co.ALOS_PROCESSING_EXTENSION)
+
     # Add an asset to the item (COG for example)
     # For assets in item loop over
     # ["date","xml","linci", "mask", "HH", "HV"]
     for key, value in assets_hrefs.items():
+        if key in co.ALOS_AUXILIARY_ASSETS:
+            media_type, roles = co.ALOS_AUXILIARY_ASSETS[key]
+            item.add_asset(
+                key,
+                Asset(
+                    href=os.path.join(root_href, os.path.basename(value)),
+                    media_type=media_type,
+                    roles=roles,
+                    title=key.capitalize(),
+                ),
+            )
+            continue
+
         item.add_asset(
             key,
             Asset(
@@ -203,18 +248,10 @@ def create_item(assets_hrefs: Dict, root_href: str = '') -> Item:
         raster = RasterExtension.ext(cog_asset, add_if_missing=True)
         raster_band = co.ALOS_BANDS.get(key)
         if raster_band:
-            if int(year) >= 17:
+            if name.yy >= 17:
                 # NoData value changed in 2019 from 0 to 1 for some
                 # Revision M 2017+ now matches
-                nodata_by_band = {
-                    "HH": 1,
-                    "HV": 1,
-                    "mask": 0,
-                    "linci": 1,
-                    "date": 1,
-                    "C": 0
-                }
-                nodata = nodata_by_band.get(key, 0)
+                nodata = co.ALOS_NODATA_BY_BAND.get(key, 0)
             else:
                 nodata = 0
             raster.bands = [
@@ -0,0 +1,121 @@
+import logging
+import warnings
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import rasterio  # type: ignore
+from rasterio.enums import Resampling  # type: ignore
+from rasterio.errors import NotGeoreferencedWarning  # type: ignore
+
+from stactools.palsar import constants as co
+
+logger = logging.getLogger(__name__)
+
+
+def read_overview(cog_path: str,
+                  size: int = co.ALOS_THUMBNAIL_SIZE) -> np.ma.MaskedArray:
+    """Read a COG decimated to roughly size x size pixels
+
+    The smallest overview that is still at least `size` pixels wide is
+    read, so the full resolution data is never touched.
+    """
+    with rasterio.open(cog_path) as dataset:
+        factors = dataset.overviews(1)
+        level = None
+        for index, factor in enumerate(factors):
+            if dataset.width // factor >= size:
+                level = index
+    kwargs = {} if level is None else {"overview_level": level}
+    with rasterio.open(cog_path, **kwargs) as dataset:
+        scale = max(dataset.width, dataset.height) / size
+        shape = (max(1, round(dataset.height / scale)),
+                 max(1, round(dataset.width / scale)))
+        return dataset.read(1,
+                            out_shape=shape,
+                            masked=True,
+                            resampling=Resampling.nearest)
+
+
+def dn_to_db(dn: np.ma.MaskedArray) -> np.ma.MaskedArray:
+    """Convert 16-bit amplitude DN to backscatter in dB
+
+    Uses the JAXA conversion 10 * log10(DN^2) + CF
+    """
+    dn = np.ma.masked_less_equal(dn.astype("float32"), 0)
+    return 20.0 * np.ma.log10(dn) + co.ALOS_PALSAR_CF_DB
+
+
+def stretch(values: np.ma.MaskedArray,
+            value_range: Tuple[float, float]) -> np.ndarray:
+    """Linearly stretch values to 1-255, keeping 0 for masked pixels"""
+    low, high = value_range
+    scaled = (values - low) / (high - low) * 254.0 + 1.0
+    scaled = np.ma.clip(scaled, 1, 255)
+    return np.ma.filled(scaled, 0).astype("uint8")
+
+
+def mos_quicklook(hh: np.ma.MaskedArray, hv: np.ma.MaskedArray) -> np.ndarray:
+    """RGB composite of HH, HV and HH/HV in dB with an alpha band"""
+    hh_db = dn_to_db(hh)
+    hv_db = dn_to_db(hv)
+    ratio_db = hh_db - hv_db
+    rgba = np.stack([
+        stretch(hh_db, co.ALOS_THUMBNAIL_HH_RANGE),
+        stretch(hv_db, co.ALOS_THUMBNAIL_HV_RANGE),
+        stretch(ratio_db, co.ALOS_THUMBNAIL_RATIO_RANGE),
+        np.zeros(hh.shape, dtype="uint8"),
+    ])
+    valid = ~np.ma.getmaskarray(hh_db) & ~np.ma.getmaskarray(hv_db)
+    rgba[3][valid] = 255
+    rgba[:3, ~valid] = 0
+    return rgba
+
+
+def fnf_quicklook(classes: np.ma.MaskedArray, year: int) -> np.ndarray:
+    """Colour FNF classes with the JAXA palette, nodata is transparent"""
+    colors = co.ALOS_FNF_COLORS if year >= 17 else co.ALOS_FNF_COLORS_PRE_2017
+    lookup = np.zeros((256, 4), dtype="uint8")
+    for value, color in colors.items():
+        lookup[value] = (*color, 255)
+    values = np.ma.filled(classes, 0).astype("uint8")
+    return np.moveaxis(lookup[values], -1, 0)
+
+
+def write_png(rgba: np.ndarray, path: str) -> str:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        with rasterio.Env(GDAL_PAM_ENABLED="NO"):
+            with rasterio.open(path,
+                               "w",
+                               driver="PNG",
+                               width=rgba.shape[2],
+                               height=rgba.shape[1],
+                               count=rgba.shape[0],
+                               dtype="uint8") as dst:
+                dst.write(rgba)
+    return path
+
+
+def create_thumbnail(cogs: Dict[str, str], year: int,
+                     path: str) -> Optional[str]:
+    """Write a PNG quicklook for a tile from the overviews of its COGs
+
+    Args:
+        cogs (dict): COG paths by band, as returned by cogify
+        year (int): Two digit year of the tile, selects the FNF palette
+        path (str): Output PNG path
+
+    Returns:
+        str: The PNG path, None if the tile has no band to preview
+    """
+    if "HH" in cogs and "HV" in cogs:
+        rgba = mos_quicklook(read_overview(cogs["HH"]),
+                             read_overview(cogs["HV"]))
+    elif "C" in cogs:
+        rgba = fnf_quicklook(read_overview(cogs["C"]), year)
+    else:
+        logger.warning(f"No band to create a thumbnail from in {cogs}")
+        return None
+
+    logger.info(f"Creating thumbnail {path}")
+    return write_png(rgba, path)
@@ -0,0 +1,290 @@
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from stactools.palsar.cache import read_range
+
+# TIFF tags used to describe the layout of a (cloud optimized) GeoTIFF
+NEW_SUBFILE_TYPE = 254
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC = 262
+SAMPLES_PER_PIXEL = 277
+PLANAR_CONFIGURATION = 284
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+SAMPLE_FORMAT = 339
+MODEL_PIXEL_SCALE = 33550
+MODEL_TIEPOINT = 33922
+GDAL_NODATA = 42113
+
+# Type code: (struct format, size in bytes)
+_TYPES = {
+    1: ("B", 1),
+    2: ("c", 1),
+    3: ("H", 2),
+    4: ("I", 4),
+    5: ("II", 8),
+    6: ("b", 1),
+    7: ("B", 1),
+    8: ("h", 2),
+    9: ("i", 4),
+    10: ("ii", 8),
+    11: ("f", 4),
+    12: ("d", 8),
+    16: ("Q", 8),
+    17: ("q", 8),
+    18: ("Q", 8),
+}
+
+# Bytes fetched on the first read, enough for the IFDs of a PALSAR tile COG
+HEADER_READ_SIZE = 64 * 1024
+# Past this offset tag data is fetched on its own instead of growing the
+# header buffer, IFDs of non cloud optimized TIFFs can sit at the end
+MAX_HEADER_SIZE = 1024 * 1024
+
+
+class TiffError(Exception):
+    """Raised when a file is not a TIFF that can be inspected"""
+    pass
+
+
+class IFD:
+    """An Image File Directory: the tags describing one image of a TIFF"""
+
+    def __init__(self, offset: int, tags: Dict[int, Any]):
+        self.offset = offset
+        self.tags = tags
+
+    def _first(self, tag: int, default: Any = None) -> Any:
+        value = self.tags.get(tag)
+        if value is None:
+            return default
+        return value[0] if isinstance(value, tuple) else value
+
+    @property
+    def width(self) -> int:
+        return self._first(IMAGE_WIDTH)
+
+    @property
+    def height(self) -> int:
+        return self._first(IMAGE_LENGTH)
+
+    @property
+    def tile_width(self) -> Optional[int]:
+        return self._first(TILE_WIDTH)
+
+    @property
+    def tile_height(self) -> Optional[int]:
+        return self._first(TILE_LENGTH)
+
+    @property
+    def is_tiled(self) -> bool:
+        return TILE_WIDTH in self.tags
+
+    @property
+    def is_overview(self) -> bool:
+        return bool(self._first(NEW_SUBFILE_TYPE, 0) & 1)
+
+    @property
+    def is_mask(self) -> bool:
+        return bool(self._first(NEW_SUBFILE_TYPE, 0) & 4)
+
+    @property
+    def compression(self) -> int:
+        return self._first(COMPRESSION, 1)
+
+    @property
+    def predictor(self) -> int:
+        return self._first(PREDICTOR, 1)
+
+    @property
+    def bits_per_sample(self) -> int:
+        return self._first(BITS_PER_SAMPLE, 1)
+
+    @property
+    def sample_format(self) -> int:
+        return self._first(SAMPLE_FORMAT, 1)
+
+    @property
+    def samples_per_pixel(self) -> int:
+        return self._first(SAMPLES_PER_PIXEL, 1)
+
+    @property
+    def tile_offsets(self) -> Tuple[int, ...]:
+        return tuple(self.tags.get(TILE_OFFSETS, ()))
+
+    @property
+    def tile_byte_counts(self) -> Tuple[int, ...]:
+        return tuple(self.tags.get(TILE_BYTE_COUNTS, ()))
+
+    @property
+    def tiles_across(self) -> int:
+        # An untiled image counts as one tile
+        return -(-self.width // (self.tile_width or self.width))
+
+    @property
+    def tiles_down(self) -> int:
+        return -(-self.height // (self.tile_height or self.height))
+
+    @property
+    def nodata(self) -> Optional[float]:
+        value = self.tags.get(GDAL_NODATA)
+        if not value:
+            return None
+        number = float(value)
+        return int(number) if number.is_integer() else number
+
+    @property
+    def origin(self) -> Optional[Tuple[float, float]]:
+        """(x, y) of the upper left corner, from the GeoTIFF tiepoint"""
+        tiepoint = self.tags.get(MODEL_TIEPOINT)
+        if not tiepoint or tiepoint[0] != 0 or tiepoint[1] != 0:
+            return None
+        return tiepoint[3], tiepoint[4]
+
+    @property
+    def pixel_size(self) -> Optional[Tuple[float, float]]:
+        scale = self.tags.get(MODEL_PIXEL_SCALE)
+        return (scale[0], scale[1]) if scale else None
+
+
+class TiffHeader:
+    """Header and IFDs of a TIFF, read with a few ranged requests"""
+
+    def __init__(self, href: str, byte_order: str, bigtiff: bool,
+                 first_ifd_offset: int, ghost: Dict, ifds: List[IFD]):
+        self.href = href
+        self.byte_order = byte_order
+        self.bigtiff = bigtiff
+        self.first_ifd_offset = first_ifd_offset
+        self.ghost = ghost
+        self.ifds = ifds
+
+    @property
+    def images(self) -> List[IFD]:
+        """Full resolution image followed by its overviews, without masks"""
+        return [ifd for ifd in self.ifds if not ifd.is_mask]
+
+    @property
+    def masks(self) -> List[IFD]:
+        return [ifd for ifd in self.ifds if ifd.is_mask]
+
+
+class _RangeReader:
+    """Serves small reads from one growing buffer at the start of a file"""
+
+    def __init__(self, href: str):
+        self.href = href
+        self.buffer = read_range(href, 0, HEADER_READ_SIZE)
+
+    def read(self, offset: int, size: int) -> bytes:
+        end = offset + size
+        if end > len(self.buffer) and end <= MAX_HEADER_SIZE:
+            grow_to = min(max(end, 2 * len(self.buffer)), MAX_HEADER_SIZE)
+            self.buffer += read_range(self.href, len(self.buffer), grow_to)
+        if end <= len(self.buffer):
+            return self.buffer[offset:end]
+        return read_range(self.href, offset, end)
+
+
+def _parse_ghost(data: bytes) -> Dict[str, str]:
+    """Parse GDAL's structural metadata ("ghost area") after the header"""
+    prefix = b"GDAL_STRUCTURAL_METADATA_SIZE="
+    if not data.startswith(prefix):
+        return {}
+    size = int(data[len(prefix):len(prefix) + 6])
+    start = data.index(b"\n") + 1
+    text = data[start:start + size].decode("ascii", "replace")
+    ghost = {"GDAL_STRUCTURAL_METADATA_SIZE": str(size)}
+    for line in text.splitlines():
+        if "=" in line:
+            key, value = line.split("=", 1)
+            ghost[key.strip()] = value.strip()
+    return ghost
+
+
+def read_tiff_header(href: str, max_ifds: int = 64) -> TiffHeader:
+    """Read the header and all IFDs of a local or remote TIFF
+
+    Only the bytes holding the header and tag data are read; for a COG
+    that is usually a single request.
+
+    Args:
+        href (str): Path or fsspec URL of the TIFF
+        max_ifds (int): Stop after this many IFDs (guards against loops)
+
+    Returns:
+        TiffHeader: The parsed header
+    """
+    reader = _RangeReader(href)
+    head = reader.read(0, 16)
+    if head[:2] == b"II":
+        order = "<"
+    elif head[:2] == b"MM":
+        order = ">"
+    else:
+        raise TiffError(f"{href} is not a TIFF file")
+    magic = struct.unpack(f"{order}H", head[2:4])[0]
+    if magic == 42:
+        bigtiff = False
+        first_ifd = struct.unpack(f"{order}I", head[4:8])[0]
+        ghost_start = 8
+    elif magic == 43:
+        bigtiff = True
+        first_ifd = struct.unpack(f"{order}Q", head[8:16])[0]
+        ghost_start = 16
+    else:
+        raise TiffError(f"{href} has an invalid TIFF version {magic}")
+
+    ghost = _parse_ghost(reader.read(ghost_start, 1024))
+
+    if bigtiff:
+        count_format, entry_size, next_format = "Q", 20, "Q"
+    else:
+        count_format, entry_size, next_format = "H", 12, "I"
+    count_size = struct.calcsize(count_format)
+    next_size = struct.calcsize(next_format)
+    value_size = 8 if bigtiff else 4
+
+    ifds: List[IFD] = []
+    offset = first_ifd
+    seen = set()
+    while offset and len(ifds) < max_ifds:
+        if offset in seen:
+            raise TiffError(f"{href} has a loop in its IFD chain")
+        seen.add(offset)
+        count = struct.unpack(f"{order}{count_format}",
+                              reader.read(offset, count_size))[0]
+        entries = reader.read(offset + count_size, count * entry_size)
+        tags: Dict[int, Any] = {}
+        for index in range(count):
+            entry = entries[index * entry_size:(index + 1) * entry_size]
+            tag, type_code = struct.unpack(f"{order}HH", entry[:4])
+            n = struct.unpack(f"{order}{'Q' if bigtiff else 'I'}",
+                              entry[4:4 + value_size])[0]
+            if type_code not in _TYPES:
+                continue
+            fmt, size = _TYPES[type_code]
+            total = n * size
+            if total <= value_size:
+                raw = entry[4 + value_size:4 + value_size + total]
+            else:
+                pointer = struct.unpack(f"{order}{'Q' if bigtiff else 'I'}",
+                                        entry[4 + value_size:])[0]
+                raw = reader.read(pointer, total)
+            if type_code == 2:
+                tags[tag] = raw.rstrip(b"\x00").decode("ascii", "replace")
+            else:
+                tags[tag] = struct.unpack(f"{order}{fmt[0] * n * len(fmt)}",
+                                          raw)
+        ifds.append(IFD(offset, tags))
+        next_offset = offset + count_size + count * entry_size
+        offset = struct.unpack(f"{order}{next_format}",
+                               reader.read(next_offset, next_size))[0]
+
+    return TiffHeader(href, order, bigtiff, first_ifd, ghost, ifds)
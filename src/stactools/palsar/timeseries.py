@@ -0,0 +1,265 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import rasterio  # type: ignore
+from dateutil.parser import isoparse
+from pystac import Asset, Item, MediaType
+from pystac.extensions.datacube import DatacubeExtension, Dimension
+from pystac.extensions.projection import ProjectionExtension
+from pystac.extensions.raster import RasterBand, RasterExtension
+from rasterio.windows import Window  # type: ignore
+from rio_cogeo.cogeo import cog_translate  # type: ignore
+from rio_cogeo.profiles import cog_profiles  # type: ignore
+from shapely.geometry import box, mapping  # type: ignore
+
+from stactools.palsar import constants as co
+from stactools.palsar.cache import open_dataset
+
+logger = logging.getLogger(__name__)
+
+
+def _read_window(dataset, window: Window,
+                 nodata: Optional[float]) -> np.ndarray:
+    data = dataset.read(1, window=window)
+    if None not in (dataset.nodata, nodata) and dataset.nodata != nodata:
+        data[data == dataset.nodata] = nodata
+    return data
+
+
+def stack_variable(hrefs: List[str],
+                   outfile: str,
+                   descriptions: List[str],
+                   workers: Optional[int] = None) -> str:
+    """Stack single band rasters into one pixel-interleaved multi-band COG
+
+    Every year is read block by block in parallel and written as one band,
+    so all years of a pixel end up in the same internal tile.
+
+    A GeoTIFF has one nodata value for all its bands, but it changed from
+    0 to 1 in 2017 for most bands. The nodata pixels of each year are set
+    to the nodata value of the last (most recent) input, so valid pixels
+    of other years that hold that value read as nodata too (e.g. a 2016
+    HH DN of 1, at the noise floor).
+
+    Args:
+        hrefs (list): Single band rasters in time order, same grid
+        outfile (str): Output COG path
+        descriptions (list): Band descriptions, one per href
+        workers (int): Number of threads reading the inputs
+
+    Returns:
+        str: The output COG path
+    """
+    datasets = [open_dataset(href) for href in hrefs]
+    tmpfile = f"{outfile}.tmp.tif"
+    try:
+        first = datasets[0]
+        for dataset in datasets[1:]:
+            if (dataset.shape != first.shape
+                    or dataset.transform != first.transform):
+                raise ValueError(
+                    f"{dataset.name} is not on the grid of {first.name}")
+
+        block = co.ALOS_TIMESERIES_BLOCKSIZE
+        profile = dict(driver="GTiff",
+                       width=first.width,
+                       height=first.height,
+                       count=len(datasets),
+                       dtype=first.dtypes[0],
+                       crs=first.crs,
+                       transform=first.transform,
+                       nodata=datasets[-1].nodata,
+                       tiled=True,
+                       blockxsize=block,
+                       blockysize=block,
+                       interleave="pixel",
+                       compress="deflate",
+                       BIGTIFF="IF_SAFER")
+        # Windows follow the 512px internal tiles of the input COGs
+        step = co.ALOS_TIMESERIES_READ_SIZE
+        with rasterio.open(tmpfile, "w", **profile) as dst, \
+                ThreadPoolExecutor(workers or len(datasets)) as executor:
+            for index, description in enumerate(descriptions, start=1):
+                dst.set_band_description(index, description)
+            for row in range(0, first.height, step):
+                for col in range(0, first.width, step):
+                    window = Window(col, row, min(step, first.width - col),
+                                    min(step, first.height - row))
+                    # Each dataset handle is only used by one thread at a time
+                    bands = list(
+                        executor.map(_read_window, datasets,
+                                     [window] * len(datasets),
+                                     [profile["nodata"]] * len(datasets)))
+                    dst.write(np.stack(bands), window=window)
+
+        output_profile = cog_profiles.get("deflate")
+        output_profile.update(
+            dict(BIGTIFF="IF_SAFER", blockxsize=block, blockysize=block))
+        cog_translate(tmpfile,
+                      outfile,
+                      output_profile,
+                      config=dict(GDAL_TIFF_OVR_BLOCKSIZE=str(block)),
+                      in_memory=False,
+                      quiet=True)
+    finally:
+        for dataset in datasets:
+            dataset.close()
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+
+    logger.info(f"Wrote time series {outfile}")
+    return outfile
+
+
+def build_timeseries(cogs_by_year: Dict[int, Dict[str, str]],
+                     output_directory: str,
+                     tile: str,
+                     variables: Optional[List[str]] = None,
+                     workers: Optional[int] = None) -> Dict[str, str]:
+    """Stack all years of a tile into one multi-band COG per variable
+
+    Args:
+        cogs_by_year (dict): COG HREFs by band, keyed by two digit year
+        output_directory (str): Directory for the time series COGs
+        tile (str): Tile name, e.g. N23W161
+        variables (list): Bands to stack, defaults to HH, HV, mask and date
+        workers (int): Number of threads reading the yearly COGs
+
+    Returns:
+        dict: Time series COG paths by variable
+    """
+    years = sorted(cogs_by_year)
+    if not years:
+        raise ValueError(f"No COGs to build a time series for {tile}")
+    variables = variables or co.ALOS_TIMESERIES_VARIABLES
+    cubes = {}
+    for variable in variables:
+        missing = [y for y in years if variable not in cogs_by_year[y]]
+        if missing:
+            raise ValueError(f"{tile} has no {variable} COG for {missing}")
+        outfile = os.path.join(
+            output_directory,
+            f"{tile}_{years[0]:02d}-{years[-1]:02d}_{variable}_timeseries.tif")
+        stack_variable([cogs_by_year[y][variable] for y in years], outfile,
+                       [f"20{y:02d}" for y in years], workers)
+        cubes[variable] = outfile
+    return cubes
+
+
+def create_timeseries_item(cubes: Dict[str, str],
+                           tile: str,
+                           years: List[int],
+                           root_href: str = '') -> Item:
+    """Create a STAC Item for the time series COGs of a tile
+
+    Each asset holds one band per year, described by a datacube time
+    dimension on the item.
+
+    Args:
+        cubes (dict): Time series COG HREFs by variable
+        tile (str): Tile name, e.g. N23W161
+        years (list): Two digit years, in band order
+        root_href (str): Optional base HREF/URL for the assets
+
+    Returns:
+        Item: STAC Item object
+    """
+    years = sorted(years)
+    with open_dataset(list(cubes.values())[0]) as dataset:
+        bbox = list(dataset.bounds)
+        transform = list(dataset.transform)
+        shape = dataset.shape
+
+    start_datetime = f"20{years[0]:02d}-01-01T00:00:00Z"
+    end_datetime = f"20{years[-1]:02d}-12-31T23:59:59Z"
+    item_id = f"{tile}_{years[0]:02d}-{years[-1]:02d}_MOS_timeseries"
+    item = Item(
+        id=item_id,
+        geometry=mapping(box(*bbox)),
+        bbox=bbox,
+        datetime=isoparse(start_datetime),
+        properties={
+            "title": item_id,
+            "description": "Multi-year PALSAR Mosaic time series",
+            "start_datetime": start_datetime,
+            "end_datetime": end_datetime,
+        },
+        stac_extensions=[],
+    )
+    item.common_metadata.gsd = co.ALOS_PALSAR_GSD
+
+    proj_attrs = ProjectionExtension.ext(item, add_if_missing=True)
+    proj_attrs.epsg = co.ALOS_PALSAR_EPSG
+    proj_attrs.bbox = bbox
+    proj_attrs.shape = shape
+    proj_attrs.transform = transform
+
+    cube = DatacubeExtension.ext(item, add_if_missing=True)
+    cube.dimensions = {
+        "time":
+        Dimension.from_dict({
+            "type": "temporal",
+            "extent": [start_datetime, end_datetime],
+            "values": [f"20{y:02d}" for y in years],
+        }),
+        "x":
+        Dimension.from_dict({
+            "type": "spatial",
+            "axis": "x",
+            "extent": [bbox[0], bbox[2]],
+            "reference_system": co.ALOS_PALSAR_EPSG,
+        }),
+        "y":
+        Dimension.from_dict({
+            "type": "spatial",
+            "axis": "y",
+            "extent": [bbox[1], bbox[3]],
+            "reference_system": co.ALOS_PALSAR_EPSG,
+        }),
+    }
+
+    for key, value in cubes.items():
+        item.add_asset(
+            key,
+            Asset(
+                href=os.path.join(root_href, os.path.basename(value)),
+                media_type=MediaType.COG,
+                roles=["data"],
+                title=f"{key} time series",
+                description=f"One band per year, {years[0]}-{years[-1]}",
+            ),
+        )
+        raster_band = co.ALOS_BANDS.get(key, {})
+        raster = RasterExtension.ext(item.assets[key], add_if_missing=True)
+        # stack_variable gives all years the nodata of the last one
+        raster.bands = [
+            RasterBand.create(nodata=_nodata(key, years[-1]),
+                              data_type=raster_band.get('data_type'))
+            for _ in years
+        ]
+
+    return item
+
+
+def _nodata(band: str, year: int) -> int:
+    if year >= 17:
+        return co.ALOS_NODATA_BY_BAND.get(band, 0)
+    return 0
+
+
+def items_by_year(items: List[Item]) -> Dict[int, Dict[str, str]]:
+    """Group the COG asset HREFs of yearly MOS items by two digit year"""
+    cogs_by_year: Dict[int, Dict[str, str]] = {}
+    for item in items:
+        year = int(item.properties["start_datetime"][2:4])
+        if year in cogs_by_year:
+            raise ValueError(f"More than one item for 20{year:02d}")
+        cogs_by_year[year] = {
+            key: asset.get_absolute_href() or asset.href
+            for key, asset in item.assets.items()
+            if asset.media_type == MediaType.COG
+        }
+    return cogs_by_year
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fsspec  # type: ignore
+from pystac import Item
+
+from stactools.palsar import stac
+
+logger = logging.getLogger(__name__)
+
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# Item properties that create_item takes from the XML sidecar
+_SIDECAR_PREFIXES = ("palsar:", "processing:")
+
+
+def content_hash(data: Dict) -> str:
+    """sha256 of a JSON document, independent of key order and spacing"""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def diff_items(old: Dict, new: Dict) -> List[str]:
+    """Paths of the fields that differ between two item dictionaries
+
+    Top level fields are compared, properties and assets one level deeper.
+    """
+    changes: List[str] = []
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        if before == after:
+            continue
+        if key in ("properties", "assets") and isinstance(
+                before, dict) and isinstance(after, dict):
+            changes.extend(f"{key}.{field}"
+                           for field in sorted(set(before) | set(after))
+                           if before.get(field) != after.get(field))
+        else:
+            changes.append(key)
+    return changes
+
+
+def _root_href(item: Item) -> str:
+    """Base HREF create_item was given, recovered from the asset HREFs"""
+    href = next(iter(item.assets.values())).href
+    return os.path.dirname(href)
+
+
+def _raster_info(item: Item) -> Optional[Dict]:
+    """Tile geometry stored by create_item in the projection fields"""
+    properties = item.properties
+    if not all(f"proj:{key}" in properties for key in ("shape", "transform")):
+        return None
+    return {
+        "bbox": item.bbox,
+        "transform": properties["proj:transform"],
+        "shape": properties["proj:shape"],
+    }
+
+
+def regenerate_item(data: Dict) -> Item:
+    """Build the item create_item produces now for an existing item
+
+    The tile geometry comes from the existing item's projection fields and
+    the sidecar properties from its properties, so no COG or XML is read.
+
+    Args:
+        data (dict): The existing item JSON
+
+    Returns:
+        Item: The item as create_item would write it
+    """
+    item = Item.from_dict(data, preserve_dict=True)
+    assets_hrefs = {key: asset.href for key, asset in item.assets.items()}
+    metadata = None
+    if "metadata" in assets_hrefs:
+        metadata = {
+            key: value
+            for key, value in item.properties.items()
+            if key.startswith(_SIDECAR_PREFIXES)
+        }
+    new = stac.create_item(assets_hrefs, _root_href(item), _raster_info(item),
+                           metadata)
+    self_link = item.get_single_link("self")
+    if self_link is not None:
+        new.set_self_href(self_link.href)
+    return new
+
+
+def update_item(href: str,
+                dry_run: bool = False) -> Tuple[str, str, List[str]]:
+    """Rewrite an item JSON if create_item would now produce another one
+
+    Args:
+        href (str): Path or fsspec URL of the item JSON
+        dry_run (bool): Only report the changes
+
+    Returns:
+        tuple: HREF, status (changed, unchanged, skipped or failed) and the
+            changed fields, or the reason for a skip or failure
+    """
+    try:
+        with fsspec.open(href, "r") as f:
+            old = json.load(f)
+        if old.get("type") != "Feature":
+            return href, SKIPPED, ["not a STAC item"]
+        new = regenerate_item(old).to_dict(include_self_link=True,
+                                           transform_hrefs=False)
+        # Round trip so tuples compare equal to the lists read from JSON
+        new = json.loads(json.dumps(new))
+        if content_hash(new) == content_hash(old):
+            return href, UNCHANGED, []
+        changes = diff_items(old, new)
+        if not dry_run:
+            with fsspec.open(href, "w") as f:
+                json.dump(new, f, indent=2)
+        return href, CHANGED, changes
+    except Exception as e:
+        return href, FAILED, [f"{type(e).__name__}: {e}"]
+
+
+def iter_update_items(
+        hrefs: Iterable[str],
+        workers: int = 16,
+        dry_run: bool = False) -> Iterator[Tuple[str, str, List[str]]]:
+    """Update many item JSONs concurrently, see update_item
+
+    Yields:
+        tuple: HREF, status and changed fields, in input order
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        yield from executor.map(partial(update_item, dry_run=dry_run), hrefs)
+
+
+def update_items(hrefs: Iterable[str],
+                 workers: int = 16,
+                 dry_run: bool = False) -> Dict[str, int]:
+    """Update many item JSONs concurrently
+
+    Returns:
+        dict: Number of items by status
+    """
+    counts: Dict[str, int] = {}
+    for href, status, changes in iter_update_items(hrefs, workers, dry_run):
+        counts[status] = counts.get(status, 0) + 1
+        if status == CHANGED:
+            logger.info(f"Updated {href}: {', '.join(changes)}")
+        elif status == FAILED:
+            logger.error(f"Failed {href} - {changes[0]}")
+    return counts
@@ -1,6 +1,15 @@
+import functools
 import os
+import re
 import shutil
-from typing import List
+import struct
+import zipfile
+from typing import Dict, List, NamedTuple, Optional
+from xml.etree import ElementTree
+
+import fsspec  # type: ignore
+
+from stactools.palsar.errors import PalsarNameError
 
 
 def extract_archive(archive: str, output_directory: str = '') -> str:
@@ -9,30 +18,129 @@ def extract_archive(archive: str, output_directory: str = '') -> str:
     return the folder
     """
     if output_directory == '':
-        output_directory = archive.split('.')[0]
+        output_directory = os.path.join(
+            os.path.dirname(archive),
+            os.path.basename(archive).split('.')[0])
     shutil.unpack_archive(archive, output_directory)
 
     return output_directory
 
 
-def palsar_name_parse(filename: str):
+def archive_extracted_size(href: str) -> Optional[int]:
+    """
+    Size in bytes of the contents of a tar.gz or zip archive (local or
+    fsspec URL), read from the gzip trailer or the zip central directory
+    without downloading or decompressing the archive.
+    The gzip trailer only holds the size modulo 4 GiB: a size below the
+    archive's own size is taken to have wrapped, but content over 4 GiB
+    that compresses better than that is under-estimated.
+    Returns None if the size can't be determined.
+    """
+    fs, path = fsspec.core.url_to_fs(href)
+    try:
+        if path.endswith(".zip"):
+            with fs.open(path, "rb") as f:
+                with zipfile.ZipFile(f) as archive:
+                    return sum(info.file_size for info in archive.infolist())
+        if path.endswith((".gz", ".tgz")):
+            size = fs.size(path)
+            # ISIZE, the uncompressed size modulo 2^32, plus tar headers
+            trailer = fs.cat_file(path, start=size - 4, end=size)
+            extracted = struct.unpack("<I", trailer)[0]
+            # A tar's headers and padding always compress, so its content
+            # is larger than the archive unless ISIZE wrapped
+            while extracted < size:
+                extracted += 2**32
+            return extracted
+    except (OSError, zipfile.BadZipFile, struct.error):
+        pass
+    return None
+
+
+# <tile>_<yy>[_<band or product>][_<mode>][.ext], e.g.
+# N23W161_20_sl_HH_F02DAR.tif, S16W150_15_C_F02DAR.hdr,
+# N23W161_20_MOS_F02DAR.tar.gz, N23W161_20_F02DAR.xml, N35E139_07_sl_HH
+_PALSAR_NAME = re.compile(
+    r"""
+    ^(?P<tile>(?P<ns>[NS])(?P<lat>\d{2})(?P<ew>[EW])(?P<lon>\d{3}))
+    _(?P<yy>\d{2})
+    (?:_(?:(?P<sl>sl_)?(?P<pol>HH|HV)|(?P<band>date|linci|mask|C)
+        |(?P<product>MOS|FNF)))?
+    (?:_(?P<mode>[A-Z]\d{2}[A-Z]{3}))?
+    (?P<extension>(?:\.[A-Za-z0-9]+)*)$
+    """, re.VERBOSE)
+
+
+class PalsarName(NamedTuple):
+    """Components of a PALSAR tile, band or archive file name"""
+    tile: str  # North west corner, e.g. N23W161
+    lat: int  # Latitude of the north edge
+    lon: int  # Longitude of the west edge
+    yy: int  # Two digit year
+    product: str  # MOS or FNF, empty for metadata sidecars
+    band: str  # HH, HV, date, linci, mask, C; empty for archives
+    mode: str  # Beam/mode code, e.g. F02DAR, empty for PALSAR-1 names
+    legacy: bool  # Polarization named sl_HH/sl_HV rather than HH/HV
+    extension: str  # e.g. .tif, .tar.gz, empty for ENVI rasters
+
+    @property
+    def year(self) -> int:
+        return 2000 + self.yy
+
+    @property
+    def stem(self) -> str:
+        """Name shared by the archive, item ID and item JSON of a tile"""
+        return f"{self.tile}_{self.yy:02d}_{self.product}"
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_basename(basename: str) -> PalsarName:
+    match = _PALSAR_NAME.match(basename)
+    if match is None:
+        raise PalsarNameError(f"{basename} is not a PALSAR file name")
+    groups = match.groupdict()
+    band = groups["pol"] or groups["band"] or ""
+    if groups["product"]:
+        product = groups["product"]
+    elif band:
+        product = "FNF" if band == "C" else "MOS"
+    else:
+        product = ""
+    lat = int(groups["lat"])
+    lon = int(groups["lon"])
+    return PalsarName(tile=groups["tile"],
+                      lat=-lat if groups["ns"] == "S" else lat,
+                      lon=-lon if groups["ew"] == "W" else lon,
+                      yy=int(groups["yy"]),
+                      product=product,
+                      band=band,
+                      mode=groups["mode"] or "",
+                      legacy=bool(groups["sl"]),
+                      extension=groups["extension"])
+
+
+def palsar_name_parse(filename: str) -> PalsarName:
     """
     Parse palsar file name into components
     TileName (NLat ELong) - LLLLLLL
     Year - YY
-    Band - sl_HH, sl_HV, date, linci, mask
-    F02DAR - constant:
+    Band - sl_HH, sl_HV, date, linci, mask, C (or product MOS, FNF)
+    F02DAR - constant, absent from PALSAR-1 names:
         F- Full Beam,
         02 Beam number,
         D - Dual polarization,
         O - ascending oribit,
         R right observation
+    Accepts paths and URLs; raises PalsarNameError for any other name.
     """
+    return _parse_basename(os.path.basename(filename.rstrip("/")))
 
 
 def palsar_folder_parse(directory: str) -> List:
     """
     Given a 1x1 tile folder, parse files that need conversion, return list of paths
+    Pre 2019 (and PALSAR-1 2007-2010) tiles are ENVI .hdr + binary pairs,
+    2019+ tiles are GeoTIFFs
     """
     matches = []
     for file in os.listdir(directory):
@@ -41,3 +149,59 @@ def palsar_folder_parse(directory: str) -> List:
         elif file.endswith(".tif"):
             matches.append(file)
     return matches
+
+
+def palsar_sidecar_parse(directory: str) -> Optional[str]:
+    """
+    Given a 1x1 tile folder, return the path of its metadata XML (2019+)
+    or None for older tiles, which carry no sidecar
+    """
+    for file in os.listdir(directory):
+        if file.endswith(".xml"):
+            return os.path.join(directory, file)
+    return None
+
+
+def palsar_metadata_parse(xml: bytes) -> Dict:
+    """
+    Extract item properties from a tile metadata XML (CARD4L NRB sidecar)
+    Acquisition dates, processing facility/software and product spacing
+    """
+    root = ElementTree.fromstring(xml)
+    general = root.find("GeneralMetadata")
+    if general is None:
+        return {}
+
+    def text(path: str) -> Optional[str]:
+        value = general.findtext(path)  # type: ignore
+        return value.strip() if value else None
+
+    properties: Dict = {}
+    # JAXA's tag names are misspelled, accept the corrected spelling too
+    first = text("DataCollectionTime/FirstAcquistionDate") or text(
+        "DataCollectionTime/FirstAcquisitionDate")
+    last = text("DataCollectionTime/LastAcquistitionDate") or text(
+        "DataCollectionTime/LastAcquisitionDate")
+    count = text("DataCollectionTime/NumberOfAcquisitions")
+    if first:
+        properties["palsar:first_acquisition_date"] = first
+    if last:
+        properties["palsar:last_acquisition_date"] = last
+    if count and count.isdigit():
+        properties["palsar:number_of_acquisitions"] = int(count)
+
+    facility = text("DataAccess/ProcessingFacility")
+    software = text("DataAccess/SoftwareVersion")
+    if facility:
+        properties["processing:facility"] = facility
+    if software:
+        name, _, version = software.rpartition(" ")
+        properties["processing:software"] = {name or software: version}
+
+    column = text("ProductSampleSpacing/ProductColumnSpacing")
+    row = text("ProductSampleSpacing/ProductRowSpacing")
+    if column and row:
+        properties["palsar:product_spacing_arcsec"] = [
+            float(column), float(row)
+        ]
+    return properties
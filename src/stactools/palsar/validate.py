@@ -0,0 +1,182 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from stactools.palsar import constants as co
+from stactools.palsar.errors import PalsarNameError
+from stactools.palsar.tiff import TiffError, TiffHeader, read_tiff_header
+from stactools.palsar.utils import palsar_name_parse
+
+logger = logging.getLogger(__name__)
+
+# Structural metadata GDAL writes for a COG that was not modified since
+_GHOST = {
+    "LAYOUT": "IFDS_BEFORE_DATA",
+    "BLOCK_ORDER": "ROW_MAJOR",
+    "BLOCK_LEADER": "SIZE_AS_UINT4",
+    "BLOCK_TRAILER": "LAST_4_BYTES_REPEATED",
+}
+
+
+def expected_overviews(width: int, height: int, block_size: int) -> int:
+    """Number of overviews cog_translate adds, halving until a block fits"""
+    count = 0
+    size = max(width, height)
+    while size > block_size:
+        size = -(-size // 2)
+        count += 1
+    return count
+
+
+def check_cog_layout(header: TiffHeader,
+                     block_size: int = co.ALOS_COG_BLOCKSIZE,
+                     overview_block_size: int = co.ALOS_COG_OVERVIEW_BLOCKSIZE,
+                     check_nodata: bool = True) -> List[str]:
+    """List the ways a TIFF header departs from the COGs cogify writes
+
+    Only the header and IFDs are inspected: the GDAL ghost area, IFDs
+    before any image data, the full resolution image first and overviews
+    in decreasing size with their data stored smallest first, internal
+    tile sizes, overview count, compression and the nodata value expected
+    for the band and year in the file name.
+
+    Args:
+        header (TiffHeader): Header read with read_tiff_header
+        block_size (int): Expected tile size of the full resolution image
+        overview_block_size (int): Expected tile size of the overviews
+        check_nodata (bool): Compare nodata with the band's expected value
+
+    Returns:
+        list: Violations, empty for a valid COG
+    """
+    violations = []
+    images = header.images
+    if not images:
+        return ["no images"]
+
+    if not header.ghost:
+        violations.append("no GDAL structural metadata (ghost area)")
+    else:
+        for key, value in _GHOST.items():
+            if header.ghost.get(key) != value:
+                violations.append(f"ghost area {key} is "
+                                  f"{header.ghost.get(key)}, not {value}")
+        if header.ghost.get("KNOWN_INCOMPATIBLE_EDITION") == "YES":
+            violations.append("modified after creation, the COG layout may "
+                              "be broken")
+
+    offsets = [ifd.offset for ifd in header.ifds]
+    if offsets != sorted(offsets):
+        violations.append("IFDs are not in file order")
+    data_start = min((offset for ifd in header.ifds
+                      for offset in ifd.tile_offsets if offset),
+                     default=0)
+    if data_start and max(offsets) > data_start:
+        violations.append("IFDs are not all before the image data")
+
+    main = header.ifds[0]
+    if main.is_overview or main.is_mask:
+        violations.append("first IFD is not the full resolution image")
+    for index, ifd in enumerate(images):
+        name = "image" if index == 0 else f"overview {index}"
+        expected = block_size if index == 0 else overview_block_size
+        if not ifd.is_tiled:
+            violations.append(f"{name} is not tiled")
+        elif (ifd.tile_width, ifd.tile_height) != (expected, expected):
+            violations.append(f"{name} tiles are {ifd.tile_width}x"
+                              f"{ifd.tile_height}, not {expected}x{expected}")
+        if ifd.compression != co.ALOS_COG_COMPRESSION:
+            violations.append(f"{name} uses compression {ifd.compression}, "
+                              f"not {co.ALOS_COG_COMPRESSION}")
+        if index and (ifd.width, ifd.height) >= (images[index - 1].width,
+                                                 images[index - 1].height):
+            violations.append(f"{name} is not smaller than the previous "
+                              f"image")
+
+    overviews = len(images) - 1
+    expected_count = expected_overviews(main.width, main.height, block_size)
+    if overviews != expected_count:
+        violations.append(f"{overviews} overviews, expected {expected_count}")
+
+    # Smallest overview data first, the full resolution image last, so a
+    # reader of the overviews never fetches bytes of the larger images
+    starts = [
+        min((offset for offset in ifd.tile_offsets if offset), default=0)
+        for ifd in images
+    ]
+    if any(later and earlier and later > earlier
+           for earlier, later in zip(starts, starts[1:])):
+        violations.append("image data is not stored smallest overview first")
+
+    if check_nodata:
+        violations.extend(_check_nodata(header))
+    return violations
+
+
+def _check_nodata(header: TiffHeader) -> List[str]:
+    try:
+        name = palsar_name_parse(header.href)
+    except PalsarNameError:
+        return []
+    if not name.band:
+        return []
+    if name.yy >= 17:
+        expected = co.ALOS_NODATA_BY_BAND.get(name.band, 0)
+    else:
+        expected = 0
+    nodata = header.images[0].nodata
+    if nodata != expected:
+        return [
+            f"nodata is {nodata}, expected {expected} for {name.band} "
+            f"in {name.year}"
+        ]
+    return []
+
+
+def _validate(href: str, **kwargs) -> Tuple[str, List[str]]:
+    try:
+        header = read_tiff_header(href)
+    except (TiffError, OSError, ValueError) as e:
+        return href, [f"unreadable: {type(e).__name__}: {e}"]
+    return href, check_cog_layout(header, **kwargs)
+
+
+def iter_cog_violations(
+        hrefs: Iterable[str],
+        workers: int = 16,
+        block_size: int = co.ALOS_COG_BLOCKSIZE,
+        overview_block_size: int = co.ALOS_COG_OVERVIEW_BLOCKSIZE,
+        check_nodata: bool = True) -> Iterator[Tuple[str, List[str]]]:
+    """Check the layout of many local or remote COGs concurrently
+
+    Each COG costs one or two ranged reads of its header.
+
+    Args:
+        hrefs (list): Paths or fsspec URLs of COGs
+        workers (int): Number of headers read concurrently
+        block_size (int): Expected tile size of the full resolution image
+        overview_block_size (int): Expected tile size of the overviews
+        check_nodata (bool): Compare nodata with the band's expected value
+
+    Yields:
+        tuple: HREF and its violations, in input order
+    """
+    validate = partial(_validate,
+                       block_size=block_size,
+                       overview_block_size=overview_block_size,
+                       check_nodata=check_nodata)
+    with ThreadPoolExecutor(workers) as executor:
+        yield from executor.map(validate, hrefs)
+
+
+def validate_cogs(hrefs: Iterable[str],
+                  workers: int = 16,
+                  **kwargs) -> Dict[str, List[str]]:
+    """Violations of each COG with any, see iter_cog_violations"""
+    invalid = {}
+    for href, violations in iter_cog_violations(hrefs, workers, **kwargs):
+        if violations:
+            logger.warning(f"{href}: {'; '.join(violations)}")
+            invalid[href] = violations
+    return invalid
@@ -0,0 +1,83 @@
+import importlib.util
+import json
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+AZURE_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "src", "azure")
+HAS_AZURE_SDK = all(
+    importlib.util.find_spec(name) is not None
+    for name in ["azure", "azure.functions", "azure.storage"])
+
+
+@unittest.skipUnless(HAS_AZURE_SDK,
+                     "needs the packages in src/azure/requirements.txt")
+class AzureFunctionTest(unittest.TestCase):
+
+    def setUp(self):
+        sys.path.insert(0, os.path.abspath(AZURE_DIRECTORY))
+        self.addCleanup(sys.path.remove, os.path.abspath(AZURE_DIRECTORY))
+        self.harness = importlib.import_module("harness")
+        self.function = importlib.import_module("palsar")
+        self.addCleanup(self.function.configure_clients, mock.Mock(),
+                        mock.Mock(), mock.Mock())
+
+    def invoke(self, directory, blob):
+        harness = self.harness
+        input_root = os.path.join(directory, "input")
+        with mock.patch.dict(os.environ):
+            harness._init_worker(input_root,
+                                 os.path.join(directory, "output"),
+                                 os.path.join(directory, "queue"),
+                                 os.path.join(directory, "scratch"),
+                                 validate=False)
+            return harness._invoke(blob)
+
+    def test_main_with_local_storage(self):
+        with TemporaryDirectory() as directory:
+            container = os.path.join(directory, "input",
+                                     self.harness.INPUT_CONTAINER)
+            os.makedirs(container)
+            os.makedirs(os.path.join(directory, "scratch"))
+            archive = self.harness.make_synthetic_archive(container,
+                                                          "N01E002",
+                                                          year=2020,
+                                                          size=64)
+
+            invocation = self.invoke(directory, os.path.basename(archive))
+
+            self.assertEqual(invocation["errors"], [])
+            messages = self.harness.LocalQueueClient(
+                os.path.join(directory, "queue")).messages()
+            self.assertEqual([m["file"] for m in messages],
+                             ["N01E002_20_MOS_F02DAR.tar.gz"])
+            self.assertEqual(set(messages[0]["timings"]),
+                             set(self.harness.STAGES))
+            output = os.path.join(directory, "output", "palsar",
+                                  "alos_palsar_mosaic")
+            with open(os.path.join(output, "N01E002_20_MOS.json")) as f:
+                item = json.load(f)
+            self.assertEqual(item["id"], "N01E002_20_MOS")
+            for asset in item["assets"].values():
+                self.assertTrue(
+                    os.path.exists(
+                        os.path.join(output, os.path.basename(asset["href"]))))
+            self.assertEqual(os.listdir(os.path.join(directory, "scratch")),
+                             [])
+
+    def test_failure_is_reported(self):
+        with TemporaryDirectory() as directory:
+            container = os.path.join(directory, "input",
+                                     self.harness.INPUT_CONTAINER)
+            os.makedirs(container)
+            os.makedirs(os.path.join(directory, "scratch"))
+            with open(os.path.join(container, "N01E002_20_MOS_F02DAR.tar.gz"),
+                      "wb") as f:
+                f.write(b"not an archive")
+
+            invocation = self.invoke(directory, "N01E002_20_MOS_F02DAR.tar.gz")
+
+            self.assertEqual(len(invocation["errors"]), 1)
+            self.assertIn("Exception", invocation["errors"][0])
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from stactools.palsar import backfill
+from tests import ALOS2_PALSAR_FNF_FILENAME, test_data
+
+
+class BackfillTest(unittest.TestCase):
+
+    def test_run_backfill_resumes(self):
+        with TemporaryDirectory() as tmp_dir:
+            source = os.path.join(tmp_dir,
+                                  os.path.basename(ALOS2_PALSAR_FNF_FILENAME))
+            shutil.copy(test_data.get_path(ALOS2_PALSAR_FNF_FILENAME), source)
+            missing = os.path.join(tmp_dir, "N00E000_15_FNF_F02DAR.tar.gz")
+            ledger_path = os.path.join(tmp_dir, "ledger.sqlite")
+            destination = os.path.join(tmp_dir, "out")
+
+            counts = backfill.run_backfill(ledger_path, destination,
+                                           [source, missing])
+            self.assertEqual(counts, {"done": 1, "failed": 1})
+            self.assertIn("S16W150_15_FNF.json", os.listdir(destination))
+            self.assertIn("S16W150_15_C_F02DAR.tif", os.listdir(destination))
+
+            ledger = backfill.WorkLedger(ledger_path)
+            done = ledger.get(source)
+            self.assertEqual(done["attempts"], 1)
+            self.assertIn("S16W150_15_C_F02DAR.tif",
+                          json.loads(done["outputs"]))
+            self.assertEqual(set(json.loads(done["timings"])),
+                             set(backfill.STAGES))
+            failed = ledger.get(missing)
+            self.assertEqual(failed["stage"], "download")
+
+            # Simulate a crash while the failed tile was being retried
+            ledger.start(missing)
+            ledger.close()
+
+            # Resuming requeues the interrupted tile and skips the done one
+            counts = backfill.run_backfill(ledger_path, destination, [source])
+            self.assertEqual(counts, {"done": 1, "failed": 1})
+            ledger = backfill.WorkLedger(ledger_path)
+            self.assertEqual(ledger.get(source)["attempts"], 1)
+            self.assertEqual(ledger.get(missing)["attempts"], 3)
+
+            # Only failed tiles are retried
+            backfill.run_backfill(ledger_path, destination, retry_failed=True)
+            self.assertEqual(ledger.get(source)["attempts"], 1)
+            self.assertEqual(ledger.get(missing)["attempts"], 4)
+            ledger.close()
+
+    def test_scratch_budget(self):
+        archive = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        projected = backfill.estimate_scratch_bytes(archive)
+        # Archive plus its 20 MB raster and the COG overhead
+        self.assertGreater(projected, os.path.getsize(archive) + 20250000)
+        self.assertEqual(
+            backfill.estimate_scratch_bytes("/does/not/exist.tar.gz"), 0)
+
+        with TemporaryDirectory() as tmp_dir:
+            sources = []
+            for name in [
+                    "S16W150_15_FNF_F02DAR.tar.gz",
+                    "S16W151_15_FNF_F02DAR.tar.gz"
+            ]:
+                sources.append(os.path.join(tmp_dir, name))
+                shutil.copy(archive, sources[-1])
+            scratch_dir = os.path.join(tmp_dir, "scratch")
+            os.makedirs(scratch_dir)
+
+            # A budget below one tile still processes tiles one at a time,
+            # estimating each tile once while it waits
+            with mock.patch.object(
+                    backfill,
+                    "estimate_scratch_bytes",
+                    wraps=backfill.estimate_scratch_bytes) as estimate:
+                counts = backfill.run_backfill(os.path.join(
+                    tmp_dir, "ledger.sqlite"),
+                                               os.path.join(tmp_dir, "out"),
+                                               sources,
+                                               workers=2,
+                                               scratch_dir=scratch_dir,
+                                               scratch_budget=1)
+            self.assertEqual(counts, {"done": 2})
+            self.assertEqual(estimate.call_count, 2)
+            self.assertEqual(os.listdir(scratch_dir), [])
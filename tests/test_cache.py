@@ -0,0 +1,93 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import fsspec
+
+from stactools.palsar import cache
+
+
+class BlockCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = fsspec.filesystem("memory")
+        self.fs.pipe("/cache-test/blob.bin", bytes(range(256)) * 64)
+        self.href = "memory://cache-test/blob.bin"
+
+    def tearDown(self):
+        self.fs.rm("/cache-test", recursive=True)
+        cache.configure_block_cache(None)
+
+    def test_read_through_cache(self):
+        with TemporaryDirectory() as tmp_dir:
+            block_cache = cache.configure_block_cache(tmp_dir, block_size=1024)
+            data = cache.read_range(self.href, 1000, 3000)
+            self.assertEqual(data, (bytes(range(256)) * 64)[1000:3000])
+            # Blocks 0, 1 and 2 were fetched and stored
+            self.assertEqual(block_cache.size(), 3 * 1024)
+
+            # A second read is served from the cached blocks
+            with cache.open_cached(self.href) as f:
+                f.seek(1024)
+                self.assertEqual(f.read(10), bytes(range(10)))
+            self.assertEqual(block_cache.size(), 3 * 1024)
+
+    def test_eviction_respects_cap(self):
+        with TemporaryDirectory() as tmp_dir:
+            block_cache = cache.configure_block_cache(tmp_dir,
+                                                      max_size=4096,
+                                                      block_size=1024)
+            cache.read_range(self.href, 0, 16384)
+            self.assertLessEqual(block_cache.size(), 4096)
+            files = [f for _, _, fs in os.walk(tmp_dir) for f in fs]
+            self.assertLessEqual(len(files), 4)
+
+    def test_eviction_skips_blocks_being_written(self):
+        with TemporaryDirectory() as tmp_dir:
+            block_cache = cache.BlockCache(tmp_dir, max_size=4096)
+            os.makedirs(os.path.join(tmp_dir, "ab"))
+            tmp_path = os.path.join(tmp_dir, "ab", "abcd.123.456.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(b"x" * 8192)
+            for start in range(0, 5 * 1024, 1024):
+                block_cache.put("memory://a", "etag", start, start + 1024,
+                                b"y" * 1024)
+            self.assertTrue(os.path.exists(tmp_path))
+            # Evicted down to 90% of the cap, not just below it
+            self.assertEqual(block_cache.size(), 3 * 1024)
+
+    def test_shared_directory_respects_cap(self):
+        with TemporaryDirectory() as tmp_dir:
+            # Two processes sharing one cache directory
+            caches = [
+                cache.BlockCache(tmp_dir, max_size=8192),
+                cache.BlockCache(tmp_dir, max_size=8192)
+            ]
+            for start in range(0, 32 * 1024, 1024):
+                block_cache = caches[start // 1024 % 2]
+                block_cache.put("memory://a", "etag", start, start + 1024,
+                                b"y" * 1024)
+            on_disk = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(tmp_dir) for name in names)
+            self.assertLessEqual(on_disk, 8192)
+
+    def test_overwrite_is_counted_once(self):
+        with TemporaryDirectory() as tmp_dir:
+            block_cache = cache.BlockCache(tmp_dir)
+            for _ in range(3):
+                block_cache.put("memory://a", "etag", 0, 1024, b"y" * 1024)
+            self.assertEqual(block_cache.size(), 1024)
+
+    def test_changed_object_is_refetched(self):
+        with TemporaryDirectory() as tmp_dir:
+            block_cache = cache.configure_block_cache(tmp_dir, block_size=1024)
+            cache.read_range(self.href, 0, 10)
+            self.fs.pipe("/cache-test/blob.bin", b"x" * 2048)
+            self.assertEqual(cache.read_range(self.href, 0, 10), b"x" * 10)
+            self.assertEqual(block_cache.size(), 2048)
+
+    def test_local_paths_bypass_cache(self):
+        self.assertFalse(cache.is_remote("/tmp/tile.tif"))
+        self.assertFalse(cache.is_remote("file:///tmp/tile.tif"))
+        self.assertTrue(cache.is_remote("https://example.com/tile.tif"))
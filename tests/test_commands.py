@@ -4,6 +4,7 @@ from tempfile import TemporaryDirectory
 import pystac
 from stactools.testing import CliTestCase
 
+from stactools.palsar import cog
 from stactools.palsar.commands import create_palsar_command
 from tests import (ALOS2_PALSAR_FNF_FILENAME, ALOS2_PALSAR_MOS_2020_FILENAME,
                    test_data)
@@ -90,3 +91,22 @@ class CommandsTest(CliTestCase):
                              "https://foo.bar/N23W161_20_date_F02DAR.tif")
 
             item.validate()
+
+    def test_create_item_from_cog(self):
+        with TemporaryDirectory() as tmp_dir:
+            # Without -c the source is a band COG, the JSON is still named
+            # after the item ID rather than the band
+            cogs = cog.cogify(test_data.get_path(ALOS2_PALSAR_FNF_FILENAME),
+                              tmp_dir,
+                              thumbnail=False)
+
+            result = self.run_command(
+                ["palsar", "create-item", cogs["C"], tmp_dir])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+
+            jsons = [p for p in os.listdir(tmp_dir) if p.endswith(".json")]
+            self.assertEqual(jsons, ["S16W150_15_FNF.json"])
+            item = pystac.read_file(os.path.join(tmp_dir, jsons[0]))
+            self.assertEqual(item.id, "S16W150_15_FNF")
@@ -0,0 +1,84 @@
+import os
+import shutil
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from stactools.palsar.envi import open_envi, parse_envi_header
+from stactools.palsar.errors import EnviHeaderError
+from tests import ALOS2_PALSAR_FNF_FILENAME, test_data
+
+HEADER = """ENVI
+description = {
+  big-endian test file}
+samples = 3
+lines   = 2
+bands   = 1
+header offset = 4
+data type = 12
+interleave = bsq
+byte order = 1
+map info = {Geographic Lat/Lon, 1.0000, 1.0000, -540000.00000000, \
+-57600.00000000, 8.0000000000e-01, 8.0000000000e-01, WGS-84, units=Seconds}
+"""
+
+
+class EnviTest(unittest.TestCase):
+
+    def test_matches_gdal(self):
+        path = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        with TemporaryDirectory() as directory:
+            shutil.unpack_archive(path, directory)
+            infile = os.path.join(directory, "S16W150_15_C_F02DAR")
+            with rasterio.open(infile) as src, open_envi(infile) as envi:
+                self.assertEqual((envi.width, envi.height),
+                                 (src.width, src.height))
+                self.assertEqual(envi.dtypes, src.dtypes)
+                self.assertEqual(envi.crs, src.crs)
+                self.assertTrue(envi.transform.almost_equals(src.transform))
+                np.testing.assert_array_equal(envi.read(1), src.read(1))
+
+                window = Window(4096, 4096, 404, 404)
+                block = dict(envi.iter_blocks(512))[window]
+                self.assertFalse(block.flags.writeable)
+                np.testing.assert_array_equal(block, src.read(1,
+                                                              window=window))
+                expected = src.read(1, window=window)
+
+            # Views taken before closing stay readable
+            np.testing.assert_array_equal(block, expected)
+            with self.assertRaises(ValueError):
+                envi.read(1)
+
+    def test_big_endian(self):
+        data = np.arange(6, dtype=">u2").reshape(2, 3) * 257
+        with TemporaryDirectory() as directory:
+            infile = os.path.join(directory, "S16W150_15_C_F02DAR")
+            with open(infile, "wb") as f:
+                f.write(b"\0" * 4 + data.tobytes())
+            with open(f"{infile}.hdr", "w") as f:
+                f.write(HEADER)
+            with open_envi(infile) as envi:
+                self.assertEqual(envi.dtypes, ("uint16", ))
+                self.assertEqual(envi.transform.c, -150)
+                self.assertEqual(envi.transform.f, -16)
+                self.assertAlmostEqual(envi.transform.a, 0.8 / 3600)
+                blocks = list(envi.iter_blocks(2))
+                self.assertEqual([window for window, _ in blocks],
+                                 [Window(0, 0, 2, 2),
+                                  Window(2, 0, 1, 2)])
+                np.testing.assert_array_equal(blocks[1][1], data[:, 2:])
+                self.assertTrue(blocks[1][1].dtype.isnative)
+
+    def test_invalid_header(self):
+        with self.assertRaises(EnviHeaderError):
+            parse_envi_header("samples = 3")
+        with self.assertRaises(EnviHeaderError):
+            parse_envi_header(HEADER.replace("lines   = 2", ""))
+        with self.assertRaises(EnviHeaderError):
+            parse_envi_header(HEADER.replace("type = 12", "type = 6")).dtype
+        with self.assertRaises(EnviHeaderError):
+            open_envi("missing")
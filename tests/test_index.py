@@ -0,0 +1,60 @@
+import json
+import os
+import unittest
+import zlib
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import rasterio
+
+from stactools.palsar import cog, index
+from stactools.palsar.tiff import read_tiff_header
+from tests import ALOS2_PALSAR_FNF_FILENAME, test_data
+
+
+class IndexTest(unittest.TestCase):
+
+    def test_read_tiff_header(self):
+        path = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path,
+                              output_directory=directory,
+                              thumbnail=False)
+            header = read_tiff_header(cogs["C"])
+            self.assertEqual(header.ghost["LAYOUT"], "IFDS_BEFORE_DATA")
+            image = header.images[0]
+            self.assertEqual((image.width, image.height), (4500, 4500))
+            self.assertEqual((image.tile_width, image.tile_height), (512, 512))
+            self.assertEqual(len(image.tile_offsets), 81)
+            self.assertEqual(image.origin, (-150.0, -16.0))
+            self.assertTrue(all(ifd.is_overview for ifd in header.images[1:]))
+
+    def test_build_reference_index(self):
+        path = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path, output_directory=directory)
+            hrefs = index.expand_sources([directory])
+            self.assertEqual(hrefs, [cogs["C"]])
+
+            references = index.build_reference_index(hrefs)
+            refs = references["refs"]
+            zarray = json.loads(refs["2015/C/.zarray"])
+            self.assertEqual(zarray["shape"], [141, 360, 4500, 4500])
+            self.assertEqual(zarray["chunks"], [1, 1, 512, 512])
+            self.assertEqual(zarray["dtype"], "|u1")
+            self.assertEqual(zarray["compressor"]["id"], "zlib")
+
+            # S16W150 is 101 rows south of 85N and 30 columns east of 180W
+            href, offset, size = refs["2015/C/101.30.8.8"]
+            with open(href, "rb") as f:
+                f.seek(offset)
+                chunk = np.frombuffer(zlib.decompress(f.read(size)),
+                                      dtype="u1").reshape(512, 512)
+            with rasterio.open(href) as dataset:
+                expected = dataset.read(1, window=((4096, 4500), (4096, 4500)))
+            self.assertTrue((chunk[:404, :404] == expected).all())
+
+            destination = os.path.join(directory, "index.json")
+            index.write_reference_index(references, destination)
+            with open(destination) as f:
+                self.assertEqual(json.load(f)["version"], 1)
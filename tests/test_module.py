@@ -1,9 +1,36 @@
+import json
+import subprocess
+import sys
 import unittest
 
 import stactools.palsar
 
+HEAVY_MODULES = [
+    "rasterio", "rio_cogeo", "shapely", "pystac", "numpy", "fsspec"
+]
+
 
 class TestModule(unittest.TestCase):
 
     def test_version(self):
         self.assertIsNotNone(stactools.palsar.__version__)
+
+    def test_lazy_api(self):
+        from stactools.palsar import stac
+        self.assertIs(stactools.palsar.create_item, stac.create_item)
+        with self.assertRaises(AttributeError):
+            stactools.palsar.not_an_attribute
+
+    def test_import_is_light(self):
+        # Importing the package and registering the CLI must not load the
+        # heavy dependencies, those are only needed when a command runs
+        code = ("import json, sys\n"
+                "import stactools.palsar\n"
+                "from stactools.palsar import commands\n"
+                f"print(json.dumps([m for m in {HEAVY_MODULES!r} "
+                "if m in sys.modules]))")
+        output = subprocess.run([sys.executable, "-c", code],
+                                check=True,
+                                capture_output=True,
+                                text=True).stdout
+        self.assertEqual(json.loads(output), [])
@@ -0,0 +1,76 @@
+import os
+import shutil
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import rasterio
+
+from stactools.palsar import cog
+from stactools.palsar.errors import CogifyError
+from stactools.palsar.pipeline import BandStatistics, BlockConsumer
+from tests import ALOS2_PALSAR_FNF_FILENAME, test_data
+
+
+class BlockCounter(BlockConsumer):
+
+    def __init__(self):
+        self.pixels = 0
+        self.writeable = set()
+
+    def consume(self, window, block):
+        self.pixels += block.size
+        self.writeable.add(block.flags.writeable)
+
+
+class PipelineTest(unittest.TestCase):
+
+    def test_cogify_consumers(self):
+        path = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        with TemporaryDirectory() as directory:
+            statistics = BandStatistics()
+            counter = BlockCounter()
+            cogs = cog.cogify(tile_path=path,
+                              output_directory=directory,
+                              thumbnail=False,
+                              consumers=[statistics, counter])
+
+            self.assertEqual(counter.pixels, 4500 * 4500)
+            self.assertEqual(counter.writeable, {False})
+            with rasterio.open(cogs["C"]) as dataset:
+                self.assertEqual(dataset.overviews(1), [2, 4, 8, 16])
+                data = dataset.read(1)
+            valid = data[data != 0].astype("float64")
+            stats = statistics.statistics["C"]
+            self.assertEqual(stats["minimum"], valid.min())
+            self.assertEqual(stats["maximum"], valid.max())
+            self.assertAlmostEqual(stats["mean"], valid.mean())
+            self.assertAlmostEqual(stats["stddev"], valid.std(), places=6)
+            self.assertAlmostEqual(stats["valid_percent"],
+                                   100 * valid.size / data.size)
+
+    def test_cogify_without_band_files(self):
+        with TemporaryDirectory() as directory:
+            # An archive holding only the metadata sidecar
+            tile = os.path.join(directory, "N23W161_20_MOS_F02DAR")
+            os.mkdir(tile)
+            with open(os.path.join(tile, "N23W161_20_MOS_F02DAR.xml"),
+                      "w") as f:
+                f.write("<metadata/>")
+            path = shutil.make_archive(tile, "gztar", root_dir=tile)
+            shutil.rmtree(tile)
+
+            with self.assertRaises(CogifyError):
+                cog.cogify(tile_path=path, output_directory=directory)
+            self.assertFalse(os.path.exists(tile))
+
+    def test_consume_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BlockConsumer()
+
+    def test_statistics_all_nodata(self):
+        statistics = BandStatistics()
+        statistics.start("HH", {"nodata": 1})
+        statistics.consume(None, np.ones((4, 4), dtype="uint16"))
+        statistics.finish()
+        self.assertEqual(statistics.statistics["HH"], {"valid_percent": 0.0})
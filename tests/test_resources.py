@@ -0,0 +1,134 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from stactools.palsar import resources
+
+GB = 1024**3
+
+
+class ResourcesTest(unittest.TestCase):
+
+    def write(self, root, name, value):
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(value)
+
+    def test_cgroup_limits(self):
+        cpus = resources.cpu_limit("/does/not/exist")
+        memory = resources.memory_limit("/does/not/exist")
+        with TemporaryDirectory() as v2:
+            # Quotas round up to whole CPUs, never above the affinity mask
+            self.write(v2, "cpu.max", "50000 100000\n")
+            self.write(v2, "memory.max", f"{GB}\n")
+            self.assertEqual(resources.cpu_limit(v2), 1)
+            self.assertEqual(resources.memory_limit(v2), min(GB, memory))
+
+            self.write(v2, "cpu.max", "max 100000\n")
+            self.write(v2, "memory.max", "max\n")
+            self.assertEqual(resources.cpu_limit(v2), cpus)
+            self.assertEqual(resources.memory_limit(v2), memory)
+
+        with TemporaryDirectory() as v1:
+            self.write(v1, "cpu/cpu.cfs_quota_us", "-1\n")
+            self.write(v1, "cpu/cpu.cfs_period_us", "100000\n")
+            self.write(v1, "memory/memory.limit_in_bytes",
+                       "9223372036854771712\n")
+            self.assertEqual(resources.cpu_limit(v1), cpus)
+            self.assertEqual(resources.memory_limit(v1), memory)
+
+    def test_plan_resources(self):
+        # Small function: one worker, cache limited by memory
+        plan = resources.plan_resources(cpus=1, memory=GB)
+        self.assertEqual((plan.workers, plan.gdal_threads), (1, 1))
+        self.assertLess(plan.gdal_cachemax, GB)
+
+        # Large VM: one worker per CPU, capped cache
+        plan = resources.plan_resources(cpus=32, memory=128 * GB)
+        self.assertEqual((plan.workers, plan.gdal_threads), (32, 1))
+        self.assertEqual(plan.gdal_cachemax, resources.MAX_GDAL_CACHE)
+
+        # Memory bound: fewer workers, spare CPUs become GDAL threads
+        plan = resources.plan_resources(cpus=8, memory=2 * GB)
+        self.assertLess(plan.workers, 8)
+        self.assertEqual(plan.gdal_threads, 8 // plan.workers)
+
+        # Overrides are kept, the rest follows from them
+        plan = resources.plan_resources(workers=2,
+                                        gdal_cachemax=256 * 1024**2,
+                                        cpus=8,
+                                        memory=8 * GB)
+        self.assertEqual((plan.workers, plan.gdal_threads), (2, 4))
+        self.assertEqual(plan.gdal_config()["GDAL_CACHEMAX"], 256 * 1024**2)
+
+        # The block pipeline's band copy leaves less memory per worker
+        plain = resources.plan_resources(cpus=8, memory=2 * GB)
+        plan = resources.plan_resources(cpus=8,
+                                        memory=2 * GB,
+                                        block_pipeline=True)
+        self.assertEqual(plan.workers, plain.workers)
+        self.assertLess(plan.gdal_cachemax, plain.gdal_cachemax)
+        self.assertLessEqual(
+            plan.workers * (resources.WORKER_OVERHEAD +
+                            resources.PIPELINE_BAND_COPY + plan.gdal_cachemax),
+            2 * GB)
+
+    def test_resources_from_env(self):
+        keys = [
+            resources.ENV_WORKERS, resources.ENV_GDAL_THREADS,
+            resources.ENV_GDAL_CACHEMAX, "GDAL_NUM_THREADS"
+        ]
+        saved = {key: os.environ.get(key) for key in keys}
+        try:
+            os.environ[resources.ENV_WORKERS] = "3"
+            os.environ[resources.ENV_GDAL_THREADS] = "2"
+            os.environ[resources.ENV_GDAL_CACHEMAX] = "128"
+            os.environ["GDAL_NUM_THREADS"] = "ALL_CPUS"
+            plan = resources.resources_from_env()
+            self.assertEqual(plan.workers, 3)
+            self.assertEqual(resources.resources_from_env(5).workers, 5)
+            self.assertEqual(plan.gdal_threads, 2)
+            self.assertEqual(plan.gdal_cachemax, 128 * 1024**2)
+            # GDAL's own variables keep precedence
+            self.assertEqual(plan.gdal_config(),
+                             {"GDAL_CACHEMAX": 128 * 1024**2})
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    def test_get_resources_unconfigured(self):
+        keys = [
+            resources.ENV_WORKERS, resources.ENV_GDAL_THREADS,
+            resources.ENV_GDAL_CACHEMAX
+        ]
+        saved = {key: os.environ.pop(key, None) for key in keys}
+        try:
+            # Without a pool, a lone cogify plans itself as one worker
+            resources.configure_resources(None)
+            with mock.patch.object(resources, "cpu_limit", return_value=32), \
+                    mock.patch.object(resources, "memory_limit",
+                                      return_value=64 * GB):
+                plan = resources.get_resources()
+            self.assertEqual((plan.workers, plan.gdal_threads), (1, 32))
+            self.assertEqual(plan.gdal_cachemax, resources.MAX_GDAL_CACHE)
+
+            # PALSAR_WORKERS still shares them out
+            resources.configure_resources(None)
+            os.environ[resources.ENV_WORKERS] = "4"
+            with mock.patch.object(resources, "cpu_limit", return_value=32), \
+                    mock.patch.object(resources, "memory_limit",
+                                      return_value=64 * GB):
+                plan = resources.get_resources()
+            self.assertEqual((plan.workers, plan.gdal_threads), (4, 8))
+        finally:
+            resources.configure_resources(None)
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
@@ -1,11 +1,16 @@
 import os
+import tarfile
 import unittest
 from tempfile import TemporaryDirectory
 
+import numpy as np
 import pystac
+import rasterio
+from rasterio.transform import from_origin
 
 from stactools.palsar import cog, stac
-from tests import ALOS2_PALSAR_MOS_FILENAME, test_data
+from tests import (ALOS2_PALSAR_FNF_FILENAME, ALOS2_PALSAR_MOS_2020_FILENAME,
+                   ALOS2_PALSAR_MOS_FILENAME, test_data)
 
 
 class StacTest(unittest.TestCase):
@@ -77,3 +82,98 @@ class StacTest(unittest.TestCase):
             print(item_path)
             item = pystac.read_file(item_path)
             item.validate()
+
+    def test_create_item_thumbnail(self):
+        path = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path, output_directory=directory)
+
+            thumbnail_path = cogs["thumbnail"]
+            self.assertEqual(os.path.basename(thumbnail_path),
+                             "S16W150_15_FNF_F02DAR.png")
+            with rasterio.open(thumbnail_path) as dataset:
+                self.assertEqual(dataset.count, 4)
+                self.assertEqual(max(dataset.shape), 512)
+
+            item = stac.create_item(cogs)
+            asset = item.assets["thumbnail"]
+            self.assertEqual(asset.media_type, pystac.MediaType.PNG)
+            self.assertEqual(asset.roles, ["thumbnail"])
+            self.assertEqual(item.assets["C"].media_type, pystac.MediaType.COG)
+
+        # Extracted sources are cleaned up once converted
+        self.assertFalse(os.path.exists(path.replace(".tar.gz", "")))
+
+    def test_create_item_metadata(self):
+        path = test_data.get_path(ALOS2_PALSAR_MOS_2020_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path,
+                              output_directory=directory,
+                              thumbnail=False)
+            self.assertEqual(os.path.basename(cogs["metadata"]),
+                             "N23W161_20_F02DAR.xml")
+
+            item = stac.create_item(cogs)
+            asset = item.assets["metadata"]
+            self.assertEqual(asset.media_type, pystac.MediaType.XML)
+            self.assertEqual(asset.roles, ["metadata"])
+            self.assertNotIn("raster:bands", asset.extra_fields)
+            self.assertEqual(item.properties["palsar:first_acquisition_date"],
+                             "2020-09-09")
+            self.assertEqual(item.properties["palsar:number_of_acquisitions"],
+                             1)
+            self.assertEqual(item.properties["processing:software"],
+                             {"Sigma-SAR IMAGE": "600-2020101700"})
+
+    def test_create_item_palsar1(self):
+        # PALSAR-1 (2007-2010) tiles: ENVI binaries with .hdr files, no
+        # mode in the file names and no XML sidecar
+        with TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source")
+            os.makedirs(source)
+            for band in ["sl_HH", "sl_HV", "date", "linci", "mask"]:
+                dtype = "uint16" if band in ("sl_HH", "sl_HV",
+                                             "date") else "uint8"
+                data = np.full((64, 64), 100, dtype=dtype)
+                data[:4] = 0
+                with rasterio.open(os.path.join(source, f"N35E139_07_{band}"),
+                                   "w",
+                                   driver="ENVI",
+                                   width=64,
+                                   height=64,
+                                   count=1,
+                                   dtype=dtype,
+                                   crs="EPSG:4326",
+                                   transform=from_origin(
+                                       139, 35, 1 / 64, 1 / 64)) as dst:
+                    dst.write(data, 1)
+            archive = os.path.join(directory, "N35E139_07_MOS.tar.gz")
+            with tarfile.open(archive, "w:gz") as tar:
+                for name in sorted(os.listdir(source)):
+                    if not name.endswith(".aux.xml"):
+                        tar.add(os.path.join(source, name), name)
+
+            output = os.path.join(directory, "cogs")
+            os.makedirs(output)
+            cogs = cog.cogify(tile_path=archive, output_directory=output)
+            self.assertEqual(
+                set(cogs), {"HH", "HV", "date", "linci", "mask", "thumbnail"})
+            self.assertEqual(os.path.basename(cogs["HH"]),
+                             "N35E139_07_sl_HH.tif")
+            with rasterio.open(cogs["HH"]) as dataset:
+                self.assertEqual(dataset.nodata, 0)
+                self.assertEqual(list(dataset.bounds),
+                                 [139.0, 34.0, 140.0, 35.0])
+
+            item = stac.create_item(cogs)
+            self.assertEqual(item.id, "N35E139_07_MOS")
+            self.assertEqual(item.properties["start_datetime"],
+                             "2007-01-01T00:00:00Z")
+            self.assertEqual(item.common_metadata.platform, "ALOS")
+            self.assertEqual(item.common_metadata.instruments, ["PALSAR"])
+            self.assertEqual(item.bbox, [139.0, 34.0, 140.0, 35.0])
+            self.assertNotIn("metadata", item.assets)
+            self.assertFalse(
+                any(key.startswith("processing:") for key in item.properties))
+            bands = item.assets["HH"].extra_fields["raster:bands"]
+            self.assertEqual(bands[0]["nodata"], 0)
@@ -0,0 +1,93 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from stactools.palsar import cog, timeseries
+from tests import ALOS2_PALSAR_MOS_2020_FILENAME, test_data
+
+
+class TimeseriesTest(unittest.TestCase):
+
+    def test_build_timeseries(self):
+        path = test_data.get_path(ALOS2_PALSAR_MOS_2020_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path,
+                              output_directory=directory,
+                              thumbnail=False)
+            # The same year twice stands in for a multi-year archive
+            cogs_by_year = {19: cogs, 20: cogs}
+
+            cubes = timeseries.build_timeseries(cogs_by_year,
+                                                directory,
+                                                "N23W161",
+                                                variables=["HH", "date"])
+            self.assertEqual(os.path.basename(cubes["HH"]),
+                             "N23W161_19-20_HH_timeseries.tif")
+            with rasterio.open(cubes["HH"]) as dataset, \
+                    rasterio.open(cogs["HH"]) as source:
+                self.assertEqual(dataset.count, 2)
+                self.assertEqual(dataset.descriptions, ("2019", "2020"))
+                self.assertEqual(dataset.block_shapes[0], (256, 256))
+                self.assertEqual(dataset.interleaving.value, "PIXEL")
+                window = ((4000, 4100), (4000, 4100))
+                expected = source.read(1, window=window)
+                stacked = dataset.read(window=window)
+                self.assertTrue((stacked[0] == expected).all())
+                self.assertTrue((stacked[1] == expected).all())
+
+            item = timeseries.create_timeseries_item(cubes, "N23W161",
+                                                     [19, 20])
+            self.assertEqual(item.id, "N23W161_19-20_MOS_timeseries")
+            self.assertEqual(
+                item.properties["cube:dimensions"]["time"]["values"],
+                ["2019", "2020"])
+            bands = item.assets["date"].extra_fields["raster:bands"]
+            self.assertEqual(len(bands), 2)
+
+            with self.assertRaises(ValueError):
+                timeseries.build_timeseries(cogs_by_year,
+                                            directory,
+                                            "N23W161",
+                                            variables=["C"])
+
+    def test_nodata_across_2017(self):
+        with TemporaryDirectory() as directory:
+            cogs_by_year = {}
+            # 0 is nodata up to 2016, 1 from 2017
+            for year, nodata in [(16, 0), (17, 1)]:
+                data = np.full((64, 64), 500, dtype="uint16")
+                data[:8] = nodata
+                path = os.path.join(directory, f"N23W161_{year}_HH.tif")
+                with rasterio.open(path,
+                                   "w",
+                                   driver="GTiff",
+                                   width=64,
+                                   height=64,
+                                   count=1,
+                                   dtype="uint16",
+                                   crs="EPSG:4326",
+                                   transform=from_origin(
+                                       -161, 23, 1 / 64, 1 / 64),
+                                   nodata=nodata) as dst:
+                    dst.write(data, 1)
+                cogs_by_year[year] = {"HH": path}
+
+            cubes = timeseries.build_timeseries(cogs_by_year,
+                                                directory,
+                                                "N23W161",
+                                                variables=["HH"])
+            with rasterio.open(cubes["HH"]) as dataset:
+                self.assertEqual(dataset.nodata, 1)
+                stacked = dataset.read(masked=True)
+            self.assertTrue(stacked.mask[:, :8].all())
+            self.assertFalse(stacked.mask[:, 8:].any())
+            self.assertTrue((stacked[:, 8:] == 500).all())
+
+            item = timeseries.create_timeseries_item(cubes, "N23W161",
+                                                     [16, 17])
+            bands = item.assets["HH"].extra_fields["raster:bands"]
+            self.assertEqual([band["nodata"] for band in bands], [1, 1])
@@ -0,0 +1,57 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from stactools.palsar import cog, stac, update
+from tests import ALOS2_PALSAR_MOS_2020_FILENAME, test_data
+
+
+class UpdateTest(unittest.TestCase):
+
+    def test_update_items(self):
+        path = test_data.get_path(ALOS2_PALSAR_MOS_2020_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path,
+                              output_directory=directory,
+                              thumbnail=False)
+            url = "https://example.com/alos_palsar_mosaic"
+            item = stac.create_item(cogs, url)
+            json_path = os.path.join(directory, f"{item.id}.json")
+            item.set_self_href(f"{url}/{item.id}.json")
+            item.save_object(dest_href=json_path)
+            stale = os.path.join(directory, "stale.json")
+            with open(json_path) as f:
+                data = json.load(f)
+            del data["properties"]["cf"]
+            data["assets"]["HH"]["title"] = "old title"
+            with open(stale, "w") as f:
+                json.dump(data, f)
+            collection = os.path.join(directory, "collection.json")
+            with open(collection, "w") as f:
+                json.dump({"type": "Collection"}, f)
+
+            # Neither the COGs nor the sidecar are read again
+            for href in cogs.values():
+                os.remove(href)
+
+            results = {
+                href: (status, changes)
+                for href, status, changes in update.iter_update_items(
+                    [json_path, stale, collection], dry_run=True)
+            }
+            self.assertEqual(results[json_path], (update.UNCHANGED, []))
+            self.assertEqual(results[stale],
+                             (update.CHANGED, ["assets.HH", "properties.cf"]))
+            self.assertEqual(results[collection][0], update.SKIPPED)
+            with open(stale) as f:
+                self.assertNotIn("cf", json.load(f)["properties"])
+
+            counts = update.update_items([json_path, stale])
+            self.assertEqual(counts, {"changed": 1, "unchanged": 1})
+            with open(stale) as f:
+                updated = json.load(f)
+            with open(json_path) as f:
+                self.assertEqual(update.content_hash(updated),
+                                 update.content_hash(json.load(f)))
+            self.assertEqual(update.update_items([stale]), {"unchanged": 1})
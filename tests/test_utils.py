@@ -0,0 +1,95 @@
+import os
+import struct
+import unittest
+from tempfile import TemporaryDirectory
+
+from stactools.palsar.errors import PalsarNameError
+from stactools.palsar.utils import (archive_extracted_size,
+                                    palsar_metadata_parse, palsar_name_parse)
+from tests import ALOS2_PALSAR_FNF_FILENAME, test_data
+
+
+class NameParseTest(unittest.TestCase):
+
+    def test_band_names(self):
+        name = palsar_name_parse("/tmp/N23W161_20_sl_HH_F02DAR.tif")
+        self.assertEqual(name.tile, "N23W161")
+        self.assertEqual((name.lat, name.lon), (23, -161))
+        self.assertEqual((name.yy, name.year), (20, 2020))
+        self.assertEqual((name.product, name.band), ("MOS", "HH"))
+        self.assertEqual(name.mode, "F02DAR")
+        self.assertTrue(name.legacy)
+        self.assertEqual(name.extension, ".tif")
+        self.assertEqual(name.stem, "N23W161_20_MOS")
+
+        name = palsar_name_parse("S16W150_15_C_F02DAR")
+        self.assertEqual((name.lat, name.lon), (-16, -150))
+        self.assertEqual((name.product, name.band), ("FNF", "C"))
+        self.assertEqual(name.extension, "")
+
+        name = palsar_name_parse("N23W161_20_date_F02DAR.tif")
+        self.assertEqual((name.product, name.band), ("MOS", "date"))
+        self.assertFalse(name.legacy)
+
+    def test_archive_and_sidecar_names(self):
+        name = palsar_name_parse("az://in/N23W161_20_MOS_F02DAR.tar.gz")
+        self.assertEqual((name.product, name.band), ("MOS", ""))
+        self.assertEqual(name.extension, ".tar.gz")
+        self.assertEqual(name.stem, "N23W161_20_MOS")
+
+        # PALSAR-1 names carry no beam/mode code
+        name = palsar_name_parse("N35E139_07_sl_HV")
+        self.assertEqual((name.year, name.band, name.mode), (2007, "HV", ""))
+
+        name = palsar_name_parse("N23W161_20_F02DAR.xml")
+        self.assertEqual((name.product, name.band), ("", ""))
+
+    def test_invalid_names(self):
+        for bad in [
+                "N23W161_20_sl_C_F02DAR.tif", "N23W161_2020_HH.tif",
+                "N23W161_20_HH_timeseries.tif", "tile.tif"
+        ]:
+            with self.assertRaises(PalsarNameError, msg=bad):
+                palsar_name_parse(bad)
+
+
+class MetadataParseTest(unittest.TestCase):
+
+    def test_metadata(self):
+        xml = b"""<?xml version="1.0"?>
+<Metadata>
+  <GeneralMetadata>
+    <DataCollectionTime>
+      <FirstAcquistionDate>2019-06-01</FirstAcquistionDate>
+      <LastAcquistitionDate>2019-08-30</LastAcquistitionDate>
+      <NumberOfAcquisitions>3</NumberOfAcquisitions>
+    </DataCollectionTime>
+    <DataAccess>
+      <ProcessingFacility>JAXA/EORC</ProcessingFacility>
+      <SoftwareVersion>Sigma-SAR IMAGE 600-2019</SoftwareVersion>
+    </DataAccess>
+  </GeneralMetadata>
+</Metadata>"""
+        properties = palsar_metadata_parse(xml)
+        self.assertEqual(properties["palsar:last_acquisition_date"],
+                         "2019-08-30")
+        self.assertEqual(properties["palsar:number_of_acquisitions"], 3)
+        self.assertEqual(properties["processing:facility"], "JAXA/EORC")
+        self.assertNotIn("palsar:product_spacing_arcsec", properties)
+
+        self.assertEqual(palsar_metadata_parse(b"<Other/>"), {})
+
+
+class ArchiveSizeTest(unittest.TestCase):
+
+    def test_gzip_size(self):
+        archive = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        # One 4500x4500 byte raster, its header and the tar headers
+        self.assertGreater(archive_extracted_size(archive), 4500 * 4500)
+
+        with TemporaryDirectory() as tmp_dir:
+            # 1 MB archive whose trailer says 10 bytes: ISIZE wrapped
+            path = os.path.join(tmp_dir, "N00E000_15_FNF_F02DAR.tar.gz")
+            with open(path, "wb") as f:
+                f.write(b"\0" * (1024**2 - 4) + struct.pack("<I", 10))
+            self.assertEqual(archive_extracted_size(path), 2**32 + 10)
@@ -0,0 +1,54 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from stactools.palsar import cog, validate
+from tests import ALOS2_PALSAR_FNF_FILENAME, test_data
+
+
+class ValidateTest(unittest.TestCase):
+
+    def test_validate_cogs(self):
+        path = test_data.get_path(ALOS2_PALSAR_FNF_FILENAME)
+        with TemporaryDirectory() as directory:
+            cogs = cog.cogify(tile_path=path,
+                              output_directory=directory,
+                              thumbnail=False)
+            self.assertEqual(validate.validate_cogs([cogs["C"]]), {})
+
+            # A tiled GeoTIFF that isn't a COG, with the pre 2017 nodata
+            plain = os.path.join(directory, "N00E000_20_sl_HH_F02DAR.tif")
+            with rasterio.open(plain,
+                               "w",
+                               driver="GTiff",
+                               width=1000,
+                               height=1000,
+                               count=1,
+                               dtype="uint16",
+                               crs="EPSG:4326",
+                               transform=from_origin(0, 1, 0.001, 0.001),
+                               tiled=True,
+                               blockxsize=256,
+                               blockysize=256,
+                               nodata=0) as dataset:
+                dataset.write(np.ones((1, 1000, 1000), dtype="uint16"))
+            missing = os.path.join(directory, "missing.tif")
+
+            invalid = validate.validate_cogs([cogs["C"], plain, missing])
+            self.assertEqual(set(invalid), {plain, missing})
+            self.assertEqual(invalid[plain], [
+                "no GDAL structural metadata (ghost area)",
+                "image tiles are 256x256, not 512x512",
+                "image uses compression 1, not 8",
+                "0 overviews, expected 1",
+                "nodata is 0, expected 1 for HH in 2020",
+            ])
+            self.assertTrue(invalid[missing][0].startswith("unreadable"))
+
+    def test_expected_overviews(self):
+        self.assertEqual(validate.expected_overviews(4500, 4500, 512), 4)
+        self.assertEqual(validate.expected_overviews(512, 300, 512), 0)